@@ -12,23 +12,79 @@ from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import json
 
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None
+
 # Import our custom modules
 from ai_service import handle_user_request, answer_any_question
 from models import (
     db, User, Conversation, Message, Flashcard, Quiz, QuizQuestion, 
     StudySession, UploadedFile, UserProgress,
     create_conversation, add_message, save_flashcards, save_quiz,
-    get_user_conversations, get_conversation_messages, get_user_flashcards,
-    update_flashcard_performance, save_study_session, update_user_progress
+    get_user_conversations, get_conversation_summaries, get_conversation_messages, get_user_flashcards,
+    page_cursor,
+    update_flashcard_performance, save_study_session, update_user_progress,
+    Difficulty, normalize_difficulty, json_dumps, json_loads
 )
 
 load_dotenv()
 
 app = Flask(__name__)
 
+if HAS_ORJSON:
+    class OrjsonProvider(DefaultJSONProvider):
+        """JSON provider that parses request bodies and renders responses with orjson"""
+        
+        # orjson always writes UTF-8; setting ensure_ascii back to True switches
+        # dumps() to the stdlib provider
+        ensure_ascii = False
+        
+        def dumps(self, obj, **kwargs):
+            # orjson covers the two layouts response() asks for: compact, or
+            # indent=2 in debug. Any other arguments go to the stdlib provider.
+            if kwargs == {'separators': (',', ':')}:
+                option = 0
+            elif kwargs == {'indent': 2}:
+                option = orjson.OPT_INDENT_2
+            else:
+                return super().dumps(obj, **kwargs)
+            if self.ensure_ascii:
+                return super().dumps(obj, **kwargs)
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            # Datetimes are passed through to Flask's default serializer so
+            # responses keep the same date format as the stdlib provider
+            return orjson.dumps(
+                obj,
+                default=self.default,
+                option=option | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ).decode()
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+    
+    app.json = OrjsonProvider(app)
+
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///brainypal.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# JSON columns (quiz options) are (de)serialized with orjson when installed
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'json_serializer': json_dumps,
+    'json_deserializer': json_loads
+}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith(('postgresql+psycopg2', 'postgresql:', 'postgres:')):
+    # psycopg2 fast execution helpers: batched executemany for the bulk UPDATE/DELETE paths too
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 1000,
+        'executemany_batch_page_size': 500
+    })
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key-change-in-production')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-for-sessions')
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
@@ -40,6 +96,20 @@ migrate = Migrate(app, db)
 cors = CORS(app)
 jwt = JWTManager(app)
 
+@app.after_request
+def commit_session(response):
+    """Commit the request's pending writes once, unless the request failed"""
+    if response.status_code < 400:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return response
+
+@app.teardown_request
+def rollback_session(exc):
+    if exc is not None:
+        db.session.rollback()
+
 # Create upload folder
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -170,20 +240,20 @@ def get_conversations():
     try:
         user_id = get_jwt_identity()
         conversations = get_user_conversations(user_id)
+        # Count and last message for every listed conversation in one grouped query
+        summaries = get_conversation_summaries([conv.id for conv in conversations])
         
         conversations_data = []
         for conv in conversations:
-            # Get last message for preview
-            last_message = Message.query.filter_by(conversation_id=conv.id)\
-                .order_by(Message.timestamp.desc()).first()
+            message_count, last_message = summaries.get(conv.id, (0, ""))
             
             conversations_data.append({
                 "id": conv.id,
                 "title": conv.title,
                 "created_at": conv.created_at.isoformat(),
                 "updated_at": conv.updated_at.isoformat(),
-                "last_message": last_message.content[:100] + "..." if last_message and len(last_message.content) > 100 else (last_message.content if last_message else ""),
-                "message_count": len(conv.messages)
+                "last_message": last_message[:100] + "..." if len(last_message) > 100 else last_message,
+                "message_count": message_count
             })
         
         return jsonify({
@@ -297,10 +367,6 @@ def send_chat_message():
             processing_time=processing_time
         )
         
-        # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
-        db.session.commit()
-        
         return jsonify({
             "user_message": {
                 "id": user_message.id,
@@ -445,8 +511,20 @@ def get_flashcards():
     try:
         user_id = get_jwt_identity()
         topic = request.args.get('topic')
+        # Always a real page size: 0 would mean "no limit" to _keyset_page and -1 to SQLite
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200))
         
-        flashcards = get_user_flashcards(user_id, topic)
+        # Keyset pagination: ?cursor=<created_at ISO>,<id> from the previous page's next_cursor
+        cursor = None
+        if request.args.get('cursor'):
+            created_at, _, last_id = request.args['cursor'].rpartition(',')
+            try:
+                cursor = (datetime.fromisoformat(created_at), int(last_id))
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+        
+        flashcards = get_user_flashcards(user_id, topic, limit=limit, cursor=cursor)
+        next_cursor = page_cursor(flashcards, limit)
         
         flashcards_data = []
         for fc in flashcards:
@@ -466,7 +544,8 @@ def get_flashcards():
         return jsonify({
             "flashcards": flashcards_data,
             "total": len(flashcards_data),
-            "filtered_by_topic": topic
+            "filtered_by_topic": topic,
+            "next_cursor": f"{next_cursor[0].isoformat()},{next_cursor[1]}" if next_cursor else None
         })
         
     except Exception as e:
@@ -580,12 +659,15 @@ def generate_quiz():
         topic = data.get('topic', '').strip()
         content = data.get('content', '').strip()
         count = data.get('count', 5)
-        difficulty = data.get('difficulty', 'mixed')
+        difficulty = normalize_difficulty(data.get('difficulty', 'mixed'), default=None)
         quiz_type = data.get('quiz_type', 'mixed')
         
         if not topic and not content:
             return jsonify({"error": "Topic or content required"}), 400
         
+        if difficulty is None:
+            return jsonify({"error": f"difficulty must be one of: {', '.join(Difficulty.enums)}"}), 400
+        
         # Generate quiz questions
         ai_results = handle_user_request(
             request_type="quiz",
@@ -888,6 +970,7 @@ def get_user_history():
         recent_conversations = Conversation.query.filter_by(user_id=user_id)\
             .filter(Conversation.created_at >= start_date)\
             .order_by(Conversation.created_at.desc()).limit(20).all()
+        message_counts = get_conversation_summaries([conv.id for conv in recent_conversations])
         
         recent_quizzes = Quiz.query.filter_by(user_id=user_id)\
             .filter(Quiz.created_at >= start_date)\
@@ -916,7 +999,7 @@ def get_user_history():
                 "title": conv.title,
                 "created_at": conv.created_at.isoformat(),
                 "metadata": {
-                    "message_count": len(conv.messages),
+                    "message_count": message_counts.get(conv.id, (0, None))[0],
                     "last_updated": conv.updated_at.isoformat()
                 }
             })
@@ -0,0 +1,83 @@
+# BrainyPal pytest configuration
+# conftest.py
+
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Set before any project module is imported so Numba-decorated helpers run
+# as plain Python on the small test payloads instead of paying for a cold
+# JIT compile. Tests marked `jit` exercise the compiled path and are run
+# separately with NUMBA_DISABLE_JIT=0.
+os.environ.setdefault('NUMBA_DISABLE_JIT', '1')
+
+# Compiled kernels for the `jit` tests are cached on disk in a stable
+# location (not the per-run tmpdir) so repeat runs skip LLVM lowering.
+os.environ.setdefault(
+    'NUMBA_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.numba_cache')
+)
+
+
+
+# Registered here, before any test module imports app: app.py creates the schema at
+# import, which opens the in-memory database's only (StaticPool) connection, and a
+# listener added later would never see its 'connect' event
+@event.listens_for(Engine, 'connect')
+def _relax_sqlite_durability(dbapi_connection, connection_record):
+    """The test database is disposable, so skip fsync and journal files"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA journal_mode=MEMORY')
+        cursor.close()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--verbose-validation', action='store_true', default=False,
+        help='print the BrainyPal feature validation reports after the test run'
+    )
+
+
+def pytest_configure(config):
+    """Set test credentials before the test modules (and the services they
+    import, which read the environment at import time) are collected"""
+    os.environ.setdefault('TESTING', 'true')
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'test_key')
+    os.environ.setdefault('INTASEND_SECRET_KEY', 'test_secret')
+    # app.py builds its engine from DATABASE_URL at import, so the test database
+    # has to be chosen here; never fall through to the developer's brainypal.db.
+    # Flask-SQLAlchemy gives in-memory SQLite a single shared StaticPool connection.
+    os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+
+
+@pytest.fixture(autouse=True)
+def block_network(monkeypatch):
+    """Fail every outbound HTTP request so services take their offline fallback paths"""
+    try:
+        import requests
+    except ImportError:
+        return
+
+    def offline_send(self, request, *args, **kwargs):
+        raise requests.exceptions.ConnectionError(
+            f"Network access disabled during tests: {request.method} {request.url}"
+        )
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, 'send', offline_send)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Print the feature validation reports only when explicitly requested"""
+    if not session.config.getoption('--verbose-validation'):
+        return
+
+    import test_integration
+    test_integration.validate_automation_features()
+    test_integration.validate_interactivity()
+    test_integration.validate_user_friendliness()
+    test_integration.check_dependency_compatibility()
@@ -7,19 +7,274 @@ NO PRE-FORMED QUESTIONS - EVERYTHING DYNAMIC
 
 import mysql.connector
 from mysql.connector import Error, pooling
+try:
+    from mysql.connector import HAVE_CEXT
+except ImportError:
+    HAVE_CEXT = False
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+try:
+    import meilisearch
+    HAS_MEILISEARCH = True
+except ImportError:
+    HAS_MEILISEARCH = False
+try:
+    import aiomysql
+    HAS_AIOMYSQL = True
+except ImportError:
+    HAS_AIOMYSQL = False
+import asyncio
+import base64
+import bcrypt
+import calendar
+import functools
 import hashlib
+import itertools
 import secrets
 import json
 import logging
+import queue
+import random
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 import os
 from contextlib import contextmanager
+from dataclasses import dataclass
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _json_dumps(obj: Any) -> str:
+    """Serialize obj for a JSON column, with orjson when it is installed"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse a JSON column value, with orjson when it is installed"""
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+# audit_logs.details is stored compressed; zstd frames are told apart from zlib by their magic number
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+if HAS_ZSTD:
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def _pack_details(details: Optional[Dict]) -> Optional[bytes]:
+    """Serialize and compress audit event details for audit_logs.details"""
+    if not details:
+        return None
+    data = _json_dumps(details).encode('utf-8')
+    return _zstd_compressor.compress(data) if HAS_ZSTD else zlib.compress(data)
+
+
+def decode_audit_details(blob: Optional[bytes]) -> Optional[Dict]:
+    """Inverse of _pack_details, for code reading audit_logs rows"""
+    if not blob:
+        return None
+    if blob[:4] == _ZSTD_MAGIC:
+        if not HAS_ZSTD:
+            raise RuntimeError("audit details were written with zstandard, which is not installed")
+        return _json_loads(_zstd_decompressor.decompress(blob))
+    return _json_loads(zlib.decompress(blob))
+
+
+# Row layouts for the login/session hot paths, read with plain tuple cursors
+_USER_COLS = ('id', 'email', 'password_hash', 'plan', 'is_verified', 'login_attempts',
+              'locked_until', 'last_login')
+UserRow = namedtuple('UserRow', _USER_COLS)
+
+_SESSION_COLS = ('id', 'email', 'plan', 'is_verified', 'expires_at')
+SessionRow = namedtuple('SessionRow', _SESSION_COLS)
+
+QuizAttemptRow = namedtuple('QuizAttemptRow', (
+    'id', 'quiz_id', 'quiz_title', 'score', 'percentage', 'time_taken', 'started_at', 'completed_at'
+))
+
+# Time-partitioned tables and how a date maps to their partition bound value
+_PARTITIONED_TABLES = {
+    'audit_logs': lambda day: calendar.timegm(day.timetuple()),   # UNIX_TIMESTAMP(timestamp)
+    'user_sessions': lambda day: day.toordinal() + 365,           # TO_DAYS(expires_at)
+}
+
+@dataclass
+class FlashcardRow:
+    """Flashcard as returned by get_user_flashcards / iter_user_flashcards"""
+    __slots__ = ('id', 'question', 'answer', 'topic', 'difficulty', 'times_reviewed',
+                 'times_correct', 'mastery_level', 'created_at')
+    id: int
+    question: str
+    answer: str
+    topic: Optional[str]
+    difficulty: str
+    times_reviewed: int
+    times_correct: int
+    mastery_level: float
+    created_at: datetime
+
+# Locked accounts match no row, so they are indistinguishable from unknown emails
+_AUTH_USER_SQL = (
+    f"SELECT {', '.join(_USER_COLS)} FROM users "
+    "WHERE email = %s AND (locked_until IS NULL OR locked_until < NOW())"
+)
+_LOGIN_SUCCESS_SQL = "UPDATE users SET login_attempts = 0, locked_until = NULL, last_login = NOW() WHERE id = %s"
+
+# Redis pub/sub channel carrying logouts and user invalidations between processes
+_SESSION_INVALIDATION_CHANNEL = 'brainypal:session-invalidation'
+
+# Statements issued by both DatabaseManager and AsyncDatabaseManager
+_ADD_MESSAGE_SQL = """
+INSERT INTO messages (
+    conversation_id, content, is_user, ai_model,
+    confidence, processing_time
+) VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+_AUDIT_INSERT_PREFIX = """
+INSERT INTO audit_logs (
+    user_id, action, resource_type, resource_id,
+    ip_address, user_agent, details
+) VALUES """
+_AUDIT_ROW_PLACEHOLDER = "(%s, %s, %s, %s, %s, %s, %s)"
+
+_SETTINGS_SQL = "SELECT setting_key, setting_value FROM app_settings"
+
+# Records a client going over its rate limit (sync and async managers)
+_RATE_BLOCK_SQL = """
+INSERT INTO rate_limits (ip_address, endpoint, request_count, window_start, is_blocked)
+VALUES (%s, %s, %s, %s, TRUE)
+ON DUPLICATE KEY UPDATE
+request_count = VALUES(request_count),
+window_start = VALUES(window_start),
+is_blocked = TRUE
+"""
+
+# search_content's FULLTEXT queries per category; each takes (query, user_id, query, limit)
+_SEARCH_QUERIES = {
+    'flashcards': """
+    SELECT id, question, answer, topic, created_at,
+           MATCH(question, answer) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
+    FROM flashcards
+    WHERE user_id = %s AND MATCH(question, answer) AGAINST(%s IN NATURAL LANGUAGE MODE)
+    ORDER BY relevance DESC
+    LIMIT %s
+    """,
+    'conversations': """
+    SELECT m.id, m.content, m.is_user, m.timestamp, c.title as conversation_title,
+           MATCH(m.content) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
+    FROM messages m
+    JOIN conversations c ON m.conversation_id = c.id
+    WHERE c.user_id = %s AND MATCH(m.content) AGAINST(%s IN NATURAL LANGUAGE MODE)
+    ORDER BY relevance DESC
+    LIMIT %s
+    """,
+    'files': """
+    SELECT id, original_filename, content_summary, uploaded_at,
+           MATCH(content) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
+    FROM uploaded_files
+    WHERE user_id = %s AND processed = TRUE
+    AND MATCH(content) AGAINST(%s IN NATURAL LANGUAGE MODE)
+    ORDER BY relevance DESC
+    LIMIT %s
+    """,
+}
+
+
+def _start_rate_window(windows: 'OrderedDict[Tuple[str, str], List]', key: Tuple[str, str],
+                       expires: float, max_keys: int) -> List:
+    """
+    (Re)start key's fixed window as the newest entry and return its [expires, count]
+    
+    Windows are kept in start order, so when the table is full the oldest
+    (normally already expired) windows are dropped first, in O(1) per insert.
+    """
+    windows.pop(key, None)
+    while len(windows) >= max_keys:
+        windows.popitem(last=False)
+    entry = windows[key] = [expires, 0]
+    return entry
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after ttl seconds"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def discard_where(self, predicate):
+        """Drop every entry whose key matches predicate"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+class GenerationBatch:
+    """Flashcards collected inside DatabaseManager.generation_batch, written when it exits"""
+    
+    def __init__(self, user_id: int, session_id: str, topic: Optional[str], difficulty: str,
+                 source_type: str, seed_factory):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.topic = topic
+        # flashcards.difficulty has no 'mixed' level
+        self.difficulty = difficulty if difficulty != 'mixed' else 'intermediate'
+        self.source_type = source_type
+        self.flashcards: List[Tuple] = []
+        self.saved = False
+        self._seed_factory = seed_factory
+    
+    def add(self, question: str, answer: str, topic: str = None, difficulty: str = None,
+            ai_confidence: float = 0.7):
+        """Queue a flashcard for this generation session"""
+        self.flashcards.append((
+            self.user_id, question, answer, topic or self.topic, difficulty or self.difficulty,
+            self.source_type, self.session_id, ai_confidence, self._seed_factory()
+        ))
+
+
 class DatabaseManager:
     """
     Complete database management for BrainyPal application
@@ -38,50 +293,221 @@ class DatabaseManager:
                        'user': 'brainypal_app',
                        'password': 'BrainyPal2024!SecureApp#',
                        'pool_name': 'brainypal_pool',
-                       'pool_size': 10
+                       'pool_size': 10,              # default: min(32, 2 * CPU count)
+                       'connection_timeout': 10
                    }
         """
         self.config = config
         self.connection_pool = None
+        self.autocommit_pool = None
+        self._pool_reset_session = False
+        
+        # In-process copy of app_settings, reloaded once the TTL lapses
+        self._settings_cache: Dict[str, str] = {}
+        self._settings_expiry: float = 0.0
+        self._settings_ttl = config.get('settings_cache_ttl', 60)
+        self._settings_lock = threading.Lock()
+        self._plan_limits_cache: Dict[str, Dict] = {}
+        
+        # Recently validated sessions, so authenticated requests skip the JOIN; keyed
+        # like the Redis tier, oldest entries evicted first when full
+        self._session_cache: 'OrderedDict[str, Tuple[Dict, float]]' = OrderedDict()
+        self._session_cache_size = config.get('session_cache_size', 10000)
+        self._session_lock = threading.Lock()
+        
+        # Generation ids and variation seeds are not security tokens: draw them from a
+        # seeded PRNG and a pre-read urandom buffer instead of a syscall per call
+        self._sid_rng = random.Random(secrets.token_bytes(16))
+        self._seed_buffer = b''
+        self._seed_offset = 0
+        self._seed_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # Preforked workers would otherwise inherit the same PRNG state and buffer
+            manager = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: manager() and manager()._reseed_after_fork())
+        
+        # Read-through caches for hot getters, invalidated by the matching writes
+        self._quiz_cache = _TTLCache(config.get('read_cache_size', 4096), config.get('read_cache_ttl', 30))
+        self._progress_cache = _TTLCache(config.get('read_cache_size', 4096), config.get('read_cache_ttl', 30))
+        
+        # Optional session cache shared between processes, checked before MySQL
+        self.redis = None
+        self._redis_session_ttl = config.get('redis_session_ttl', 3600)
+        if config.get('redis_url'):
+            if HAS_REDIS:
+                self.redis = redis.Redis.from_url(config['redis_url'])
+            else:
+                logger.warning("redis_url is set but the redis package is not installed")
+        
+        # How long another process's logout can go unnoticed by this process's session
+        # cache. With Redis, logouts are published and the TTL only bounds missed messages;
+        # without it the TTL is the whole revocation window, so it defaults much shorter.
+        self._session_ttl = config.get('session_cache_ttl', 30 if self.redis is not None else 5)
+        
+        # Fixed-window request counters: (ip, endpoint) -> [window_end, count]
+        self._rate_windows: 'OrderedDict[Tuple[str, str], List]' = OrderedDict()
+        self._rate_lock = threading.Lock()
+        self._rate_max_keys = config.get('rate_limit_max_keys', 100000)
+        
+        # Optional external search index; documents are queued and pushed in batches
+        self.search_client = None
+        self.search_index = None
+        self._search_queue: queue.Queue = queue.Queue(maxsize=config.get('search_queue_size', 10000))
+        self._search_batch_size = config.get('search_batch_size', 500)
+        self._search_flush_interval = config.get('search_flush_interval', 1.0)
+        if config.get('meilisearch_url'):
+            if HAS_MEILISEARCH:
+                self.search_client = meilisearch.Client(config['meilisearch_url'], config.get('meilisearch_key'))
+                self.search_index = self.search_client.index(config.get('meilisearch_index', 'content'))
+                try:
+                    self.search_index.update_filterable_attributes(['user_id', 'type'])
+                except meilisearch.errors.MeilisearchError as e:
+                    logger.warning("Could not configure search index: %s", e)
+            else:
+                logger.warning("meilisearch_url is set but the meilisearch package is not installed")
+        
+        # last_active bumps are queued and written in batches by a background thread
+        self._last_active_queue: queue.Queue = queue.Queue()
+        self._last_active_interval = config.get('last_active_flush_interval', 10)
+        
+        # Audit events are queued and written in multi-row batches by a background thread
+        self._audit_queue: queue.Queue = queue.Queue(maxsize=config.get('audit_queue_size', 10000))
+        self._audit_batch_size = config.get('audit_batch_size', 500)
+        self._audit_flush_interval = config.get('audit_flush_interval', 1.0)
+        
         self.setup_connection_pool()
+        
+        threading.Thread(target=self._last_active_flush_loop, daemon=True).start()
+        threading.Thread(target=self._audit_flush_loop, daemon=True).start()
+        if self.search_index is not None:
+            threading.Thread(target=self._search_flush_loop, daemon=True).start()
+        if self.redis is not None:
+            threading.Thread(target=self._session_invalidation_loop, daemon=True).start()
     
     def setup_connection_pool(self):
-        """Setup MySQL connection pool for better performance"""
+        """
+        Setup MySQL connection pools for better performance
+        
+        The main pool is transactional and used for multi-statement flows.
+        A second autocommit pool serves single-statement reads and writes
+        (session checks, settings, audit logging) without a COMMIT round trip.
+        
+        Sessions are not reset when a connection goes back to the pool: the
+        app uses no temporary tables or session variables, and a reset costs
+        a round trip (a full re-authentication on MySQL 5.6) per checkout and
+        would discard cached prepared statements. get_connection rolls back
+        any transaction a caller left open instead. Broken connections need
+        no sweeper: the pool pings each connection as it is checked out
+        (is_connected()) and reconnects it there, and prepared_cursor notices
+        the new session.
+        """
+        pool_name = self.config.get('pool_name', 'brainypal_pool')
+        default_pool_size = min(pooling.CNX_POOL_MAXSIZE, (os.cpu_count() or 4) * 2)
+        connection_args = dict(
+            pool_reset_session=self._pool_reset_session,
+            connection_timeout=self.config.get('connection_timeout', 10),
+            host=self.config['host'],
+            database=self.config['database'],
+            user=self.config['user'],
+            password=self.config['password'],
+            charset='utf8mb4',
+            collation='utf8mb4_unicode_ci',
+            time_zone='+00:00',
+            # C extension protocol when available; the pure-Python one is a fallback
+            use_pure=not HAVE_CEXT
+        )
+        
         try:
             self.connection_pool = mysql.connector.pooling.MySQLConnectionPool(
-                pool_name=self.config.get('pool_name', 'brainypal_pool'),
-                pool_size=self.config.get('pool_size', 10),
-                pool_reset_session=True,
-                host=self.config['host'],
-                database=self.config['database'],
-                user=self.config['user'],
-                password=self.config['password'],
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci',
+                pool_name=pool_name,
+                pool_size=self.config.get('pool_size', default_pool_size),
                 autocommit=False,
-                time_zone='+00:00'
+                **connection_args
+            )
+            self.autocommit_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name=f"{pool_name}_autocommit",
+                pool_size=self.config.get('autocommit_pool_size', self.config.get('pool_size', default_pool_size)),
+                autocommit=True,
+                **connection_args
             )
             logger.info("Database connection pool created successfully")
         except Error as e:
-            logger.error(f"Error creating connection pool: {e}")
+            logger.error("Error creating connection pool: %s", e)
             raise
 
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
+    def get_connection(self, autocommit: bool = False):
+        """
+        Context manager for database connections
+        
+        Args:
+            autocommit: Take the connection from the autocommit pool; use only
+                        for single-statement work that needs no explicit commit
+        """
+        pool = self.autocommit_pool if autocommit else self.connection_pool
         connection = None
         try:
-            connection = self.connection_pool.get_connection()
+            connection = pool.get_connection()
+            if self._pool_reset_session:
+                # A session reset deallocates the server-side prepared statements
+                self._drop_prepared_cursors(connection)
             yield connection
         except Error as e:
             if connection:
+                # A failed statement may mean a lost or reset session; prepare afresh next time
+                self._drop_prepared_cursors(connection)
                 connection.rollback()
-            logger.error(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             raise
         finally:
-            if connection and connection.is_connected():
+            if connection:
+                # Without a session reset, an abandoned transaction would leak into the next checkout
+                if connection.in_transaction:
+                    connection.rollback()
                 connection.close()
 
+    @staticmethod
+    def _drop_prepared_cursors(connection):
+        """Forget the prepared cursors cached on a pooled connection"""
+        getattr(connection, '_cnx', connection).__dict__.pop('_prep_cache', None)
+
+    def prepared_cursor(self, connection, sql: str):
+        """
+        Get a server-side prepared cursor for sql, reused across checkouts
+        
+        The cache lives on the underlying pooled connection, so each SQL
+        string is parsed by the server once per server session. It is tagged
+        with the session's thread id: a reconnect (pool checkout after a
+        server restart, failover or wait_timeout) starts a new session whose
+        server has never seen the old statement handles, so the cache is
+        discarded and every statement is prepared again.
+        """
+        cnx = getattr(connection, '_cnx', connection)
+        thread_id = cnx.connection_id
+        tagged = cnx.__dict__.get('_prep_cache')
+        if tagged is None or tagged[0] != thread_id:
+            tagged = cnx.__dict__['_prep_cache'] = (thread_id, {})
+        cache = tagged[1]
+        cursor = cache.get(sql)
+        if cursor is None:
+            cursor = cache[sql] = connection.cursor(prepared=True)
+        return cursor
+
+    def cached_cursor(self, connection, dictionary: bool = False):
+        """
+        Get a buffered cursor kept on the underlying pooled connection
+        
+        Buffered cursors hold no unread result between calls, so one cursor
+        per kind can be reused by every read on that connection.
+        """
+        cnx = getattr(connection, '_cnx', connection)
+        attr = '_dict_cursor' if dictionary else '_cursor'
+        cursor = cnx.__dict__.get(attr)
+        if cursor is None:
+            cursor = connection.cursor(dictionary=dictionary, buffered=True)
+            cnx.__dict__[attr] = cursor
+        return cursor
+
     def create_database_schema(self):
         """
         Create the complete BrainyPal database schema
@@ -95,10 +521,11 @@ class DatabaseManager:
             CREATE TABLE IF NOT EXISTS users (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 email VARCHAR(255) NOT NULL UNIQUE,
-                password_hash VARCHAR(255) NOT NULL,
+                -- bcrypt (60 chars) or legacy salt:sha256 (97 chars), compared byte-wise
+                password_hash VARCHAR(97) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
                 plan ENUM('free', 'premium', 'pro') DEFAULT 'free',
                 is_verified BOOLEAN DEFAULT FALSE,
-                verification_code VARCHAR(6) DEFAULT NULL,
+                verification_code CHAR(6) CHARACTER SET ascii COLLATE ascii_bin DEFAULT NULL,
                 verification_expires DATETIME DEFAULT NULL,
                 login_attempts INT DEFAULT 0,
                 locked_until TIMESTAMP NULL DEFAULT NULL,
@@ -112,22 +539,27 @@ class DatabaseManager:
             )
             """,
             
-            # Create user sessions table
+            # Create user sessions table, partitioned weekly by expires_at (see
+            # rotate_partitions); partitioned InnoDB tables cannot carry foreign keys
             """
             CREATE TABLE IF NOT EXISTS user_sessions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
+                id INT AUTO_INCREMENT,
                 user_id INT NOT NULL,
-                session_token VARCHAR(255) NOT NULL,
+                session_token BINARY(32) NOT NULL,
                 expires_at DATETIME NOT NULL,
                 ip_address VARCHAR(45),
                 user_agent TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
-                INDEX idx_token (session_token),
+                PRIMARY KEY (id, expires_at),
+                INDEX idx_user_expires (user_id, expires_at),
+                INDEX idx_token_covering (session_token, user_id, expires_at),
                 INDEX idx_expires (expires_at)
             )
+            PARTITION BY RANGE (TO_DAYS(expires_at)) (
+                PARTITION p_init VALUES LESS THAN (TO_DAYS('2025-01-01')),
+                PARTITION p_future VALUES LESS THAN MAXVALUE
+            )
             """,
             
             # Create conversations table
@@ -141,7 +573,7 @@ class DatabaseManager:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_updated (user_id, updated_at DESC),
                 INDEX idx_updated_at (updated_at),
                 INDEX idx_topic (topic)
             )
@@ -160,7 +592,7 @@ class DatabaseManager:
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 
                 FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE,
-                INDEX idx_conversation_id (conversation_id),
+                INDEX idx_conversation_user_time (conversation_id, is_user, timestamp),
                 INDEX idx_timestamp (timestamp),
                 INDEX idx_is_user (is_user),
                 FULLTEXT(content)
@@ -194,7 +626,8 @@ class DatabaseManager:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_created (user_id, created_at DESC),
+                INDEX idx_user_topic_created (user_id, topic, created_at DESC),
                 INDEX idx_topic (topic),
                 INDEX idx_source_type (source_type),
                 INDEX idx_generation_session (generation_session),
@@ -224,7 +657,8 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_created (user_id, created_at DESC),
+                INDEX idx_user_topic_created (user_id, topic, created_at DESC),
                 INDEX idx_topic (topic),
                 INDEX idx_generation_session (generation_session),
                 INDEX idx_created_at (created_at)
@@ -276,7 +710,7 @@ class DatabaseManager:
                 FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                 INDEX idx_quiz_id (quiz_id),
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_started (user_id, started_at, percentage),
                 INDEX idx_started_at (started_at)
             )
             """,
@@ -305,11 +739,13 @@ class DatabaseManager:
                 processed_at TIMESTAMP DEFAULT NULL,
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                UNIQUE KEY unique_user_filename (user_id, filename),
+                INDEX idx_user_uploaded (user_id, uploaded_at DESC),
                 INDEX idx_processed (processed),
                 INDEX idx_uploaded_at (uploaded_at),
                 FULLTEXT(content)
             )
+            ROW_FORMAT=COMPRESSED
             """,
             
             # Create study sessions table
@@ -331,7 +767,8 @@ class DatabaseManager:
                 ended_at TIMESTAMP DEFAULT NULL,
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
+                -- Covers the get_user_study_stats aggregate without touching the rows
+                INDEX idx_user_started (user_id, started_at, time_spent, items_studied, correct_answers, accuracy),
                 INDEX idx_session_type (session_type),
                 INDEX idx_topic (topic),
                 INDEX idx_started_at (started_at)
@@ -359,7 +796,7 @@ class DatabaseManager:
                 
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                 UNIQUE KEY unique_user_topic (user_id, topic),
-                INDEX idx_user_id (user_id),
+                INDEX idx_user_mastery (user_id, mastery_level DESC, last_studied DESC),
                 INDEX idx_topic (topic),
                 INDEX idx_mastery_level (mastery_level),
                 INDEX idx_last_studied (last_studied)
@@ -408,24 +845,28 @@ class DatabaseManager:
             )
             """,
             
-            # Create audit logs table
+            # Create audit logs table, partitioned weekly by timestamp (see rotate_partitions)
             """
             CREATE TABLE IF NOT EXISTS audit_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
+                id INT AUTO_INCREMENT,
                 user_id INT NULL,
                 action VARCHAR(100) NOT NULL,
                 resource_type VARCHAR(50) NULL,
                 resource_id INT NULL,
                 ip_address VARCHAR(45) NULL,
                 user_agent TEXT NULL,
-                details JSON NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                details MEDIUMBLOB NULL,
+                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                 
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+                PRIMARY KEY (id, timestamp),
                 INDEX idx_user_id (user_id),
                 INDEX idx_action (action),
                 INDEX idx_timestamp (timestamp)
             )
+            PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+                PARTITION p_init VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+                PARTITION p_future VALUES LESS THAN MAXVALUE
+            )
             """,
             
             # Create rate limits table
@@ -442,6 +883,101 @@ class DatabaseManager:
                 INDEX idx_ip_address (ip_address),
                 INDEX idx_window_start (window_start)
             )
+            """,
+            
+            # Per-user daily action counters, kept up to date by the *_usage_ai triggers.
+            # A "day" is the UTC calendar date (UTC_DATE()), independent of the
+            # server's and the session's time zone.
+            """
+            CREATE TABLE IF NOT EXISTS user_daily_usage (
+                user_id INT NOT NULL,
+                day DATE NOT NULL,
+                action ENUM('chat', 'flashcard_generation', 'file_upload') NOT NULL,
+                used INT NOT NULL DEFAULT 0,
+                
+                PRIMARY KEY (user_id, day, action),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                INDEX idx_day (day)
+            )
+            """,
+            
+            # Keep quizzes.total_questions in step with inserted questions server-side
+            "DROP TRIGGER IF EXISTS quiz_questions_ai",
+            """
+            CREATE TRIGGER quiz_questions_ai AFTER INSERT ON quiz_questions
+            FOR EACH ROW
+                UPDATE quizzes SET total_questions = total_questions + 1 WHERE id = NEW.quiz_id
+            """,
+            
+            # Touch the parent conversation whenever a message is added
+            "DROP TRIGGER IF EXISTS messages_ai",
+            """
+            CREATE TRIGGER messages_ai AFTER INSERT ON messages
+            FOR EACH ROW
+                UPDATE conversations SET updated_at = NOW() WHERE id = NEW.conversation_id
+            """,
+            
+            # Daily usage counters read by check_user_daily_usage
+            "DROP TRIGGER IF EXISTS messages_usage_ai",
+            """
+            CREATE TRIGGER messages_usage_ai AFTER INSERT ON messages
+            FOR EACH ROW
+                INSERT INTO user_daily_usage (user_id, day, action, used)
+                SELECT c.user_id, UTC_DATE(), 'chat', 1
+                FROM conversations c
+                WHERE c.id = NEW.conversation_id AND NEW.is_user
+                ON DUPLICATE KEY UPDATE used = user_daily_usage.used + 1
+            """,
+            # A generation counts once, on the first flashcard of its generation_session
+            "DROP TRIGGER IF EXISTS flashcards_usage_ai",
+            """
+            CREATE TRIGGER flashcards_usage_ai AFTER INSERT ON flashcards
+            FOR EACH ROW
+                INSERT INTO user_daily_usage (user_id, day, action, used)
+                SELECT NEW.user_id, UTC_DATE(), 'flashcard_generation', 1
+                FROM DUAL
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM flashcards
+                    WHERE generation_session = NEW.generation_session AND id <> NEW.id
+                )
+                ON DUPLICATE KEY UPDATE used = user_daily_usage.used + 1
+            """,
+            "DROP TRIGGER IF EXISTS uploaded_files_usage_ai",
+            """
+            CREATE TRIGGER uploaded_files_usage_ai AFTER INSERT ON uploaded_files
+            FOR EACH ROW
+                INSERT INTO user_daily_usage (user_id, day, action, used)
+                VALUES (NEW.user_id, UTC_DATE(), 'file_upload', 1)
+                ON DUPLICATE KEY UPDATE used = used + 1
+            """,
+            
+            # Backfill today's counters from the source tables, so a database that gains
+            # the rollup mid-day does not start everyone at zero. Runs after the triggers:
+            # rows they already counted are in both, and GREATEST keeps re-runs idempotent.
+            """
+            INSERT INTO user_daily_usage (user_id, day, action, used)
+            SELECT c.user_id, UTC_DATE(), 'chat', COUNT(*)
+            FROM messages m
+            JOIN conversations c ON m.conversation_id = c.id
+            WHERE m.is_user AND m.timestamp >= UTC_DATE()
+            GROUP BY c.user_id
+            ON DUPLICATE KEY UPDATE used = GREATEST(used, VALUES(used))
+            """,
+            """
+            INSERT INTO user_daily_usage (user_id, day, action, used)
+            SELECT user_id, UTC_DATE(), 'flashcard_generation', COUNT(DISTINCT generation_session)
+            FROM flashcards
+            WHERE created_at >= UTC_DATE()
+            GROUP BY user_id
+            ON DUPLICATE KEY UPDATE used = GREATEST(used, VALUES(used))
+            """,
+            """
+            INSERT INTO user_daily_usage (user_id, day, action, used)
+            SELECT user_id, UTC_DATE(), 'file_upload', COUNT(*)
+            FROM uploaded_files
+            WHERE uploaded_at >= UTC_DATE()
+            GROUP BY user_id
+            ON DUPLICATE KEY UPDATE used = GREATEST(used, VALUES(used))
             """
         ]
         
@@ -449,9 +985,10 @@ class DatabaseManager:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                for command in schema_commands:
-                    cursor.execute(command)
-                    logger.info(f"Executed: {command[:50]}...")
+                # Send the whole schema in one round trip and drain the per-statement results
+                ddl = ";\n".join(schema_commands)
+                for result in cursor.execute(ddl, multi=True):
+                    logger.info("Executed: %s...", result.statement.strip()[:50])
                 
                 connection.commit()
                 logger.info("Database schema created successfully")
@@ -460,7 +997,7 @@ class DatabaseManager:
                 self.insert_default_settings(connection)
                 
         except Error as e:
-            logger.error(f"Error creating database schema: {e}")
+            logger.error("Error creating database schema: %s", e)
             raise
 
     def insert_default_settings(self, connection):
@@ -485,29 +1022,39 @@ class DatabaseManager:
         ]
         
         cursor = connection.cursor()
-        insert_query = """
+        
+        # One multi-row INSERT; executemany may fall back to a statement per row
+        placeholders = ", ".join(["(%s, %s, %s)"] * len(default_settings))
+        insert_query = f"""
         INSERT IGNORE INTO app_settings (setting_key, setting_value, description) 
-        VALUES (%s, %s, %s)
+        VALUES {placeholders}
         """
         
-        cursor.executemany(insert_query, default_settings)
+        cursor.execute(insert_query, [value for row in default_settings for value in row])
+        connection.commit()
         logger.info("Default app settings inserted")
 
     # =============================================================================
     # USER MANAGEMENT METHODS
     # =============================================================================
     
+    # bcrypt cost factor; 10 rounds is roughly 50 ms per hash on current hardware
+    BCRYPT_ROUNDS = 10
+    
     def hash_password(self, password: str) -> str:
-        """Hash password using SHA-256 with salt"""
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-        return f"{salt}:{password_hash}"
+        """Hash password using bcrypt"""
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.BCRYPT_ROUNDS)).decode('ascii')
     
     def verify_password(self, password: str, stored_hash: str) -> bool:
-        """Verify password against stored hash"""
+        """Verify password against stored hash (bcrypt, or legacy salt:sha256)"""
         try:
+            if stored_hash.startswith('$2'):
+                return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('ascii'))
+            
             salt, password_hash = stored_hash.split(':')
-            return hashlib.sha256((password + salt).encode()).hexdigest() == password_hash
+            return secrets.compare_digest(
+                hashlib.sha256((password + salt).encode()).hexdigest(), password_hash
+            )
         except:
             return False
     
@@ -517,27 +1064,25 @@ class DatabaseManager:
     
     def increment_login_attempts(self, user_id: int, connection):
         """Increment login attempts and lock account if necessary"""
+        max_attempts = int(self.get_setting('max_login_attempts', '5'))
+        lockout_duration = int(self.get_setting('lockout_duration_minutes', '30'))
+        
         cursor = connection.cursor()
         
+        # MySQL applies SET assignments left to right, so locked_until is
+        # computed from the pre-increment login_attempts value
         cursor.execute(
-            "UPDATE users SET login_attempts = login_attempts + 1 WHERE id = %s",
-            (user_id,)
+            """
+            UPDATE users
+            SET locked_until = CASE
+                    WHEN login_attempts + 1 >= %s THEN DATE_ADD(NOW(), INTERVAL %s MINUTE)
+                    ELSE locked_until
+                END,
+                login_attempts = login_attempts + 1
+            WHERE id = %s
+            """,
+            (max_attempts, lockout_duration, user_id)
         )
-        
-        # Check if we need to lock the account
-        cursor.execute("SELECT login_attempts FROM users WHERE id = %s", (user_id,))
-        attempts = cursor.fetchone()[0]
-        
-        max_attempts = int(self.get_setting('max_login_attempts', '5'))
-        lockout_duration = int(self.get_setting('lockout_duration_minutes', '30'))
-        
-        if attempts >= max_attempts:
-            locked_until = datetime.now() + timedelta(minutes=lockout_duration)
-            cursor.execute(
-                "UPDATE users SET locked_until = %s WHERE id = %s",
-                (locked_until, user_id)
-            )
-            logger.warning(f"Account locked due to too many login attempts: {user_id}")
     
     def reset_login_attempts(self, user_id: int, connection):
         """Reset login attempts and unlock account"""
@@ -565,13 +1110,12 @@ class DatabaseManager:
             verification_expires = datetime.now() + timedelta(hours=24)
             
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 query = """
                 INSERT INTO users (email, password_hash, plan, verification_code, verification_expires)
                 VALUES (%s, %s, %s, %s, %s)
                 """
                 
+                cursor = self.prepared_cursor(connection, query)
                 cursor.execute(query, (email, password_hash, plan, verification_code, verification_expires))
                 user_id = cursor.lastrowid
                 connection.commit()
@@ -581,11 +1125,11 @@ class DatabaseManager:
                     'email': email, 'plan': plan
                 })
                 
-                logger.info(f"User created successfully: {email}")
+                logger.info("User created successfully: %s", email)
                 return user_id
                 
         except Error as e:
-            logger.error(f"Error creating user: {e}")
+            logger.error("Error creating user: %s", e)
             return None
 
     def authenticate_user(self, email: str, password: str, ip_address: str = None) -> Optional[Dict]:
@@ -602,52 +1146,38 @@ class DatabaseManager:
         """
         try:
             with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
-                
-                # Check if user exists and get details
-                query = """
-                SELECT id, email, password_hash, plan, is_verified, login_attempts, 
-                       locked_until, last_login
-                FROM users WHERE email = %s
-                """
+                # Get the user unless the account is unknown or locked
+                cursor = self.prepared_cursor(connection, _AUTH_USER_SQL)
+                cursor.execute(_AUTH_USER_SQL, (email,))
+                rows = cursor.fetchall()
                 
-                cursor.execute(query, (email,))
-                user = cursor.fetchone()
-                
-                if not user:
+                if not rows:
                     return None
                 
-                # Check if account is locked
-                if user['locked_until'] and datetime.now() < user['locked_until']:
-                    logger.warning(f"Login attempt on locked account: {email}")
-                    return None
+                user = UserRow(*rows[0])
                 
                 # Verify password
-                if not self.verify_password(password, user['password_hash']):
+                if not self.verify_password(password, user.password_hash):
                     # Increment login attempts
-                    self.increment_login_attempts(user['id'], connection)
+                    self.increment_login_attempts(user.id, connection)
+                    connection.commit()
                     return None
                 
-                # Reset login attempts on successful login
-                self.reset_login_attempts(user['id'], connection)
-                
-                # Update last login
-                cursor.execute(
-                    "UPDATE users SET last_login = %s WHERE id = %s",
-                    (datetime.now(), user['id'])
-                )
+                # Reset login attempts and record the login in one statement
+                cursor = self.prepared_cursor(connection, _LOGIN_SUCCESS_SQL)
+                cursor.execute(_LOGIN_SUCCESS_SQL, (user.id,))
                 
                 connection.commit()
                 
                 # Log successful login
-                self.log_audit_event(user['id'], 'user_login', details={
+                self.log_audit_event(user.id, 'user_login', details={
                     'ip_address': ip_address
                 })
                 
-                return user
+                return user._asdict()
                 
         except Error as e:
-            logger.error(f"Error authenticating user: {e}")
+            logger.error("Error authenticating user: %s", e)
             return None
 
     def create_session(self, user_id: int, ip_address: str = None, user_agent: str = None) -> str:
@@ -663,24 +1193,25 @@ class DatabaseManager:
             Session token
         """
         try:
-            session_token = secrets.token_urlsafe(32)
+            # Raw bytes are stored; clients get the same 43-char urlsafe form as token_urlsafe(32)
+            token = secrets.token_bytes(32)
+            session_token = base64.urlsafe_b64encode(token).rstrip(b'=').decode('ascii')
             expires_at = datetime.now() + timedelta(hours=24)
             
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 query = """
                 INSERT INTO user_sessions (user_id, session_token, expires_at, ip_address, user_agent)
                 VALUES (%s, %s, %s, %s, %s)
                 """
                 
-                cursor.execute(query, (user_id, session_token, expires_at, ip_address, user_agent))
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (user_id, token, expires_at, ip_address, user_agent))
                 connection.commit()
                 
                 return session_token
                 
         except Error as e:
-            logger.error(f"Error creating session: {e}")
+            logger.error("Error creating session: %s", e)
             return None
 
     def validate_session(self, session_token: str) -> Optional[Dict]:
@@ -693,33 +1224,181 @@ class DatabaseManager:
         Returns:
             User data if session is valid, None otherwise
         """
+        token = self.decode_session_token(session_token)
+        if token is None:
+            return None
+        cache_key = self._redis_session_key(token)
+        
+        with self._session_lock:
+            cached = self._session_cache.get(cache_key)
+        
+        if cached and cached[1] > time.monotonic() and cached[0]['expires_at'] > datetime.now():
+            self._last_active_queue.put(cached[0]['id'])
+            return dict(cached[0])
+        
+        result = self._get_redis_session(token)
+        
+        if result is None:
+            try:
+                with self.get_connection(autocommit=True) as connection:
+                    query = """
+                    SELECT u.id, u.email, u.plan, u.is_verified, s.expires_at
+                    FROM user_sessions s
+                    JOIN users u ON s.user_id = u.id
+                    WHERE s.session_token = %s AND s.expires_at > %s
+                    """
+                    
+                    cursor = self.prepared_cursor(connection, query)
+                    cursor.execute(query, (token, datetime.now()))
+                    rows = cursor.fetchall()
+                    
+            except Error as e:
+                logger.error("Error validating session: %s", e)
+                return None
+            
+            if not rows:
+                return None
+            
+            result = SessionRow(*rows[0])._asdict()
+            self._set_redis_session(token, result)
+        
+        # last_active is written by the background flush
+        self._last_active_queue.put(result['id'])
+        
+        with self._session_lock:
+            self._session_cache[cache_key] = (dict(result), time.monotonic() + self._session_ttl)
+            self._session_cache.move_to_end(cache_key)
+            while len(self._session_cache) > self._session_cache_size:
+                self._session_cache.popitem(last=False)
+        
+        return result
+
+    def _publish_session_invalidation(self, message: str):
+        """Tell the other processes to drop a session ('session:<digest>') or a user ('user:<id>')"""
+        if self.redis is None:
+            return
+        
+        try:
+            self.redis.publish(_SESSION_INVALIDATION_CHANNEL, message)
+        except redis.RedisError as e:
+            logger.warning("Error publishing session invalidation: %s", e)
+
+    def _drop_cached_user_sessions(self, user_id: int):
+        """Remove every locally cached session belonging to user_id"""
+        with self._session_lock:
+            stale = [key for key, (result, _) in self._session_cache.items() if result['id'] == user_id]
+            for key in stale:
+                del self._session_cache[key]
+
+    def invalidate_user_sessions(self, user_id: int):
+        """
+        Stop serving a user's sessions from the in-process caches
+        
+        Call after changing anything validate_session returns or depends on
+        (plan, verification, deactivation); the next request re-reads MySQL.
+        """
+        self._drop_cached_user_sessions(user_id)
+        self._publish_session_invalidation(f"user:{user_id}")
+
+    def _session_invalidation_loop(self):
+        """Background loop applying logouts and user invalidations published by other processes"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_SESSION_INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    data = message['data']
+                    data = data.decode() if isinstance(data, bytes) else data
+                    if data.startswith('user:'):
+                        self._drop_cached_user_sessions(int(data[5:]))
+                    else:
+                        with self._session_lock:
+                            self._session_cache.pop(data, None)
+            except (redis.RedisError, ValueError) as e:
+                logger.warning("Session invalidation subscription lost: %s", e)
+            
+            # Messages may have been missed while disconnected
+            with self._session_lock:
+                self._session_cache.clear()
+            time.sleep(1)
+
+    @staticmethod
+    def _redis_session_key(token: bytes) -> str:
+        """Redis key for a session; keyed by a digest so raw tokens never leave MySQL"""
+        return f"session:{hashlib.sha256(token).hexdigest()}"
+
+    def _get_redis_session(self, token: bytes) -> Optional[Dict]:
+        """Look a session up in Redis; None on miss, expiry, or Redis errors"""
+        if self.redis is None:
+            return None
+        
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
-                
-                query = """
-                SELECT u.id, u.email, u.plan, u.is_verified, s.expires_at
-                FROM user_sessions s
-                JOIN users u ON s.user_id = u.id
-                WHERE s.session_token = %s AND s.expires_at > %s
-                """
-                
-                cursor.execute(query, (session_token, datetime.now()))
-                result = cursor.fetchone()
-                
-                if result:
-                    # Update user's last_active
-                    cursor.execute(
-                        "UPDATE users SET last_active = %s WHERE id = %s",
-                        (datetime.now(), result['id'])
-                    )
-                    connection.commit()
+            payload = self.redis.get(self._redis_session_key(token))
+        except redis.RedisError as e:
+            logger.warning("Redis session lookup failed, falling back to MySQL: %s", e)
+            return None
+        
+        if payload is None:
+            return None
+        
+        result = _json_loads(payload)
+        result['expires_at'] = datetime.fromisoformat(result['expires_at'])
+        return result if result['expires_at'] > datetime.now() else None
+
+    def _set_redis_session(self, token: bytes, result: Dict):
+        """Store a validated session in Redis, never past the session's own expiry"""
+        if self.redis is None:
+            return
+        
+        ttl = min(self._redis_session_ttl, int((result['expires_at'] - datetime.now()).total_seconds()))
+        if ttl <= 0:
+            return
+        
+        payload = _json_dumps({**result, 'expires_at': result['expires_at'].isoformat()})
+        try:
+            self.redis.setex(self._redis_session_key(token), ttl, payload)
+        except redis.RedisError as e:
+            logger.warning("Error caching session in Redis: %s", e)
+
+    @staticmethod
+    def decode_session_token(session_token: str) -> Optional[bytes]:
+        """Convert a client session token back to the 32 raw bytes stored in user_sessions"""
+        try:
+            token = base64.urlsafe_b64decode(session_token + '=' * (-len(session_token) % 4))
+        except (ValueError, TypeError):
+            return None
+        return token if len(token) == 32 else None
+
+    def _last_active_flush_loop(self):
+        """Background loop writing queued last_active updates"""
+        while True:
+            time.sleep(self._last_active_interval)
+            self.flush_last_active()
+
+    def flush_last_active(self):
+        """Write all queued last_active bumps with a single UPDATE"""
+        user_ids = set()
+        while True:
+            try:
+                user_ids.add(self._last_active_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        if not user_ids:
+            return
+        
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = connection.cursor()
                 
-                return result
+                placeholders = ", ".join(["%s"] * len(user_ids))
+                cursor.execute(
+                    f"UPDATE users SET last_active = NOW() WHERE id IN ({placeholders})",
+                    tuple(user_ids)
+                )
                 
         except Error as e:
-            logger.error(f"Error validating session: {e}")
-            return None
+            logger.error("Error updating last_active: %s", e)
 
     def verify_user_email(self, email: str, verification_code: str) -> bool:
         """Verify user email with code"""
@@ -738,39 +1417,70 @@ class DatabaseManager:
                 connection.commit()
                 
                 if success:
-                    logger.info(f"Email verified successfully: {email}")
+                    logger.info("Email verified successfully: %s", email)
                 
                 return success
                 
         except Error as e:
-            logger.error(f"Error verifying email: {e}")
+            logger.error("Error verifying email: %s", e)
             return False
 
     def delete_session(self, session_token: str) -> bool:
         """Delete a user session (logout)"""
+        token = self.decode_session_token(session_token)
+        if token is None:
+            return False
+        cache_key = self._redis_session_key(token)
+        
+        with self._session_lock:
+            self._session_cache.pop(cache_key, None)
+        
+        if self.redis is not None:
+            try:
+                self.redis.delete(cache_key)
+            except redis.RedisError as e:
+                logger.warning("Error removing session from Redis: %s", e)
+            self._publish_session_invalidation(cache_key)
+        
         try:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                cursor.execute("DELETE FROM user_sessions WHERE session_token = %s", (session_token,))
+                cursor.execute("DELETE FROM user_sessions WHERE session_token = %s", (token,))
                 success = cursor.rowcount > 0
                 connection.commit()
                 
                 return success
                 
         except Error as e:
-            logger.error(f"Error deleting session: {e}")
+            logger.error("Error deleting session: %s", e)
             return False
 
     # =============================================================================
     # DYNAMIC CONTENT GENERATION METHODS
     # =============================================================================
     
+    def _reseed_after_fork(self):
+        """Give a forked child its own id PRNG state and urandom buffer"""
+        self._sid_rng.seed(secrets.token_bytes(16))
+        self._seed_buffer = b''
+        self._seed_offset = 0
+        # The parent's lock may have been held by another thread at fork time
+        self._seed_lock = threading.Lock()
+
     def generate_session_id(self, user_id: int) -> str:
         """Generate unique session ID for content generation"""
-        timestamp = int(datetime.now().timestamp())
-        random_part = secrets.randbelow(10000)
-        return f"{user_id}_{timestamp}_{random_part}"
+        return f"{user_id}_{int(time.time())}_{self._sid_rng.getrandbits(32):08x}"
+
+    def generate_variation_seed(self) -> str:
+        """Generate a 16-hex-char content variation seed"""
+        with self._seed_lock:
+            if self._seed_offset + 8 > len(self._seed_buffer):
+                self._seed_buffer = os.urandom(4096)
+                self._seed_offset = 0
+            seed = self._seed_buffer[self._seed_offset:self._seed_offset + 8]
+            self._seed_offset += 8
+        return seed.hex()
 
     def create_flashcard(self, user_id: int, question: str, answer: str, topic: str = None,
                         difficulty: str = 'intermediate', source_type: str = 'topic_generation',
@@ -795,11 +1505,9 @@ class DatabaseManager:
             if not generation_session:
                 generation_session = self.generate_session_id(user_id)
             
-            variation_seed = secrets.token_hex(8)
+            variation_seed = self.generate_variation_seed()
             
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 query = """
                 INSERT INTO flashcards (
                     user_id, question, answer, topic, difficulty, source_type,
@@ -807,6 +1515,7 @@ class DatabaseManager:
                 ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 
+                cursor = self.prepared_cursor(connection, query)
                 cursor.execute(query, (
                     user_id, question, answer, topic, difficulty, source_type,
                     generation_session, ai_confidence, variation_seed
@@ -815,13 +1524,84 @@ class DatabaseManager:
                 flashcard_id = cursor.lastrowid
                 connection.commit()
                 
-                logger.info(f"Flashcard created: {flashcard_id}")
+                self._queue_search_document('flashcards', flashcard_id, user_id=user_id,
+                                            question=question, answer=answer, topic=topic)
+                
+                logger.info("Flashcard created: %s", flashcard_id)
                 return flashcard_id
                 
         except Error as e:
-            logger.error(f"Error creating flashcard: {e}")
+            logger.error("Error creating flashcard: %s", e)
             return None
 
+    # Rows per multi-row INSERT, keeping each statement well under max_allowed_packet
+    BULK_INSERT_CHUNK = 1000
+
+    def _bulk_insert(self, cursor, insert_prefix: str, rows: List[Tuple]) -> int:
+        """Insert rows with multi-row VALUES statements, BULK_INSERT_CHUNK rows at a time"""
+        row_placeholder = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+        
+        for start in range(0, len(rows), self.BULK_INSERT_CHUNK):
+            chunk = rows[start:start + self.BULK_INSERT_CHUNK]
+            cursor.execute(
+                f"{insert_prefix} VALUES {', '.join([row_placeholder] * len(chunk))}",
+                list(itertools.chain.from_iterable(chunk))
+            )
+        
+        return len(rows)
+
+    def create_flashcards_bulk(self, user_id: int, flashcards: List[Dict], topic: str = None,
+                               difficulty: str = 'intermediate', source_type: str = 'topic_generation',
+                               generation_session: str = None) -> int:
+        """
+        Create many flashcards from one generation in a single transaction
+        
+        Args:
+            user_id: User ID
+            flashcards: Dicts with 'question' and 'answer', optionally 'topic',
+                        'difficulty' and 'ai_confidence' overriding the defaults
+            topic: Default topic
+            difficulty: Default difficulty level
+            source_type: How the flashcards were generated
+            generation_session: Unique generation session ID
+            
+        Returns:
+            Number of flashcards created (0 on error)
+        """
+        if not flashcards:
+            return 0
+        
+        try:
+            if not generation_session:
+                generation_session = self.generate_session_id(user_id)
+            
+            rows = [
+                (
+                    user_id, card['question'], card['answer'], card.get('topic', topic),
+                    card.get('difficulty', difficulty), source_type, generation_session,
+                    card.get('ai_confidence', 0.7), self.generate_variation_seed()
+                )
+                for card in flashcards
+            ]
+            
+            with self.get_connection() as connection:
+                cursor = connection.cursor()
+                
+                created = self._bulk_insert(cursor, """
+                INSERT INTO flashcards (
+                    user_id, question, answer, topic, difficulty, source_type,
+                    generation_session, ai_confidence, variation_seed
+                )""", rows)
+                
+                connection.commit()
+                
+                logger.info("Flashcards created: %s", created)
+                return created
+                
+        except Error as e:
+            logger.error("Error creating flashcards: %s", e)
+            return 0
+
     def create_quiz(self, user_id: int, title: str, topic: str = None,
                    difficulty: str = 'mixed', source_type: str = 'topic_generation',
                    time_limit: int = None, passing_score: float = 70.0) -> Optional[int]:
@@ -842,7 +1622,7 @@ class DatabaseManager:
         """
         try:
             generation_session = self.generate_session_id(user_id)
-            variation_seed = secrets.token_hex(8)
+            variation_seed = self.generate_variation_seed()
             
             with self.get_connection() as connection:
                 cursor = connection.cursor()
@@ -862,11 +1642,11 @@ class DatabaseManager:
                 quiz_id = cursor.lastrowid
                 connection.commit()
                 
-                logger.info(f"Quiz created: {quiz_id}")
+                logger.info("Quiz created: %s", quiz_id)
                 return quiz_id
                 
         except Error as e:
-            logger.error(f"Error creating quiz: {e}")
+            logger.error("Error creating quiz: %s", e)
             return None
 
     def add_quiz_question(self, quiz_id: int, question: str, question_type: str,
@@ -892,10 +1672,8 @@ class DatabaseManager:
         """
         try:
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 # Convert options to JSON if provided
-                options_json = json.dumps(options) if options else None
+                options_json = _json_dumps(options) if options else None
                 
                 query = """
                 INSERT INTO quiz_questions (
@@ -904,35 +1682,81 @@ class DatabaseManager:
                 ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 
+                cursor = self.prepared_cursor(connection, query)
                 cursor.execute(query, (
                     quiz_id, question, question_type, correct_answer, options_json,
                     explanation, difficulty, points, ai_confidence
                 ))
                 
+                # quizzes.total_questions is bumped by the quiz_questions_ai trigger
                 question_id = cursor.lastrowid
-                
-                # Update total questions count in quiz
-                cursor.execute(
-                    "UPDATE quizzes SET total_questions = total_questions + 1 WHERE id = %s",
-                    (quiz_id,)
-                )
-                
                 connection.commit()
                 
-                logger.info(f"Quiz question added: {question_id}")
+                self._quiz_cache.discard_where(lambda key: key[0] == quiz_id)
+                
+                logger.info("Quiz question added: %s", question_id)
                 return question_id
                 
         except Error as e:
-            logger.error(f"Error adding quiz question: {e}")
+            logger.error("Error adding quiz question: %s", e)
             return None
 
+    def add_quiz_questions_bulk(self, quiz_id: int, questions: List[Dict]) -> int:
+        """
+        Add many questions to a quiz in a single transaction
+        
+        Args:
+            quiz_id: Quiz ID
+            questions: Dicts with the add_quiz_question fields ('question',
+                       'question_type', 'correct_answer' and optionally
+                       'options', 'explanation', 'difficulty', 'points',
+                       'ai_confidence')
+            
+        Returns:
+            Number of questions added (0 on error)
+        """
+        if not questions:
+            return 0
+        
+        try:
+            rows = [
+                (
+                    quiz_id, q['question'], q['question_type'], q['correct_answer'],
+                    _json_dumps(q['options']) if q.get('options') else None,
+                    q.get('explanation'), q.get('difficulty', 'intermediate'),
+                    q.get('points', 1), q.get('ai_confidence', 0.7)
+                )
+                for q in questions
+            ]
+            
+            with self.get_connection() as connection:
+                cursor = connection.cursor()
+                
+                added = self._bulk_insert(cursor, """
+                INSERT INTO quiz_questions (
+                    quiz_id, question, question_type, correct_answer, options,
+                    explanation, difficulty, points, ai_confidence
+                )""", rows)
+                
+                # quizzes.total_questions is bumped by the quiz_questions_ai trigger
+                connection.commit()
+                
+                self._quiz_cache.discard_where(lambda key: key[0] == quiz_id)
+                
+                logger.info("Quiz questions added to quiz %s: %s", quiz_id, added)
+                return added
+                
+        except Error as e:
+            logger.error("Error adding quiz questions: %s", e)
+            return 0
+
     def create_generation_session(self, user_id: int, generation_type: str, topic: str = None,
                                  difficulty: str = 'mixed', content_source: str = None,
                                  ai_model: str = 'huggingface', prompt_used: str = None) -> str:
         """Create a generation session record"""
         try:
             session_id = self.generate_session_id(user_id)
-            variation_seed = secrets.token_hex(8)
+            variation_seed = self.generate_variation_seed()
             
             with self.get_connection() as connection:
                 cursor = connection.cursor()
@@ -953,76 +1777,160 @@ class DatabaseManager:
                 return session_id
                 
         except Error as e:
-            logger.error(f"Error creating generation session: {e}")
+            logger.error("Error creating generation session: %s", e)
             return None
 
-    def update_generation_session(self, session_id: str, items_generated: int = None,
-                                 generation_time: float = None):
-        """Update generation session with completion data"""
+    @contextmanager
+    def generation_batch(self, user_id: int, generation_type: str = 'flashcards', topic: str = None,
+                         difficulty: str = 'mixed', content_source: str = None,
+                         ai_model: str = 'huggingface', prompt_used: str = None,
+                         source_type: str = 'topic_generation'):
+        """
+        Record a generation session and its flashcards in one transaction
+        
+        Usage:
+            with db.generation_batch(user_id, topic='Biology') as batch:
+                for card in cards:
+                    batch.add(card['question'], card['answer'])
+        
+        Nothing touches the database until the block exits; then the session
+        row (with items_generated filled in) and all flashcards are written
+        on a single connection with one commit. If the block raises, nothing
+        is written. batch.saved reports whether the write succeeded.
+        """
+        batch = GenerationBatch(
+            user_id, self.generate_session_id(user_id), topic, difficulty,
+            source_type, self.generate_variation_seed
+        )
+        
+        yield batch
+        
         try:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                updates = []
-                params = []
+                query = """
+                INSERT INTO generation_sessions (
+                    user_id, session_id, generation_type, topic, difficulty,
+                    content_source, variation_seed, ai_model, prompt_used, items_generated
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """
                 
-                if items_generated is not None:
-                    updates.append("items_generated = %s")
-                    params.append(items_generated)
+                cursor.execute(query, (
+                    user_id, batch.session_id, generation_type, topic, difficulty,
+                    content_source, self.generate_variation_seed(), ai_model, prompt_used,
+                    len(batch.flashcards)
+                ))
                 
-                if generation_time is not None:
-                    updates.append("generation_time = %s")
-                    params.append(generation_time)
+                if batch.flashcards:
+                    self._bulk_insert(cursor, """
+                    INSERT INTO flashcards (
+                        user_id, question, answer, topic, difficulty, source_type,
+                        generation_session, ai_confidence, variation_seed
+                    )""", batch.flashcards)
                 
-                if updates:
-                    params.append(session_id)
-                    query = f"UPDATE generation_sessions SET {', '.join(updates)} WHERE session_id = %s"
-                    cursor.execute(query, params)
-                    connection.commit()
+                connection.commit()
+                batch.saved = True
+                
+        except Error as e:
+            logger.error("Error saving generation batch: %s", e)
+
+    def update_generation_session(self, session_id: str, items_generated: int = None,
+                                 generation_time: float = None):
+        """Update generation session with completion data"""
+        if items_generated is None and generation_time is None:
+            return
+        
+        try:
+            with self.get_connection() as connection:
+                # One fixed statement for every field subset; None keeps the current value
+                query = """
+                UPDATE generation_sessions
+                SET items_generated = COALESCE(%s, items_generated),
+                    generation_time = COALESCE(%s, generation_time)
+                WHERE session_id = %s
+                """
+                
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (items_generated, generation_time, session_id))
+                connection.commit()
                 
         except Error as e:
-            logger.error(f"Error updating generation session: {e}")
+            logger.error("Error updating generation session: %s", e)
 
     # =============================================================================
     # DATA RETRIEVAL METHODS
     # =============================================================================
     
-    def get_user_flashcards(self, user_id: int, topic: str = None, limit: int = None) -> List[Dict]:
+    def get_user_flashcards(self, user_id: int, topic: str = None, limit: int = None) -> List[FlashcardRow]:
         """Get user's flashcards with optional filtering"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
-                
-                query = """
-                SELECT id, question, answer, topic, difficulty, times_reviewed,
-                       times_correct, mastery_level, created_at
-                FROM flashcards
-                WHERE user_id = %s
-                """
-                params = [user_id]
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection)
                 
-                if topic:
-                    query += " AND topic = %s"
-                    params.append(topic)
-                
-                query += " ORDER BY created_at DESC"
+                query, params = self._flashcards_query(user_id, topic)
                 
                 if limit:
                     query += " LIMIT %s"
                     params.append(limit)
                 
                 cursor.execute(query, params)
-                return cursor.fetchall()
+                return [FlashcardRow(*row) for row in cursor.fetchall()]
                 
         except Error as e:
-            logger.error(f"Error getting flashcards: {e}")
+            logger.error("Error getting flashcards: %s", e)
             return []
 
+    def iter_user_flashcards(self, user_id: int, topic: str = None, chunk: int = 500) -> Iterator[FlashcardRow]:
+        """
+        Stream a user's flashcards without loading them all into memory
+        
+        Rows are read from an unbuffered cursor chunk rows at a time; use
+        list(...) for a list. The connection is held until the generator
+        is exhausted or closed.
+        """
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = connection.cursor(buffered=False)
+                try:
+                    query, params = self._flashcards_query(user_id, topic)
+                    cursor.execute(query, params)
+                    
+                    while True:
+                        batch = cursor.fetchmany(chunk)
+                        if not batch:
+                            break
+                        for row in batch:
+                            yield FlashcardRow(*row)
+                finally:
+                    # Discards any unread rows so the connection goes back to the pool clean
+                    cursor.close()
+                
+        except Error as e:
+            logger.error("Error streaming flashcards: %s", e)
+
+    @staticmethod
+    def _flashcards_query(user_id: int, topic: str = None) -> Tuple[str, List]:
+        """SELECT for a user's flashcards, newest first, in FlashcardRow column order"""
+        query = f"""
+        SELECT {', '.join(FlashcardRow.__slots__)}
+        FROM flashcards
+        WHERE user_id = %s
+        """
+        params = [user_id]
+        
+        if topic:
+            query += " AND topic = %s"
+            params.append(topic)
+        
+        query += " ORDER BY created_at DESC"
+        return query, params
+
     def get_user_quizzes(self, user_id: int, topic: str = None, limit: int = None) -> List[Dict]:
         """Get user's quizzes with optional filtering"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection, dictionary=True)
                 
                 query = """
                 SELECT id, title, topic, difficulty, total_questions,
@@ -1046,63 +1954,75 @@ class DatabaseManager:
                 return cursor.fetchall()
                 
         except Error as e:
-            logger.error(f"Error getting quizzes: {e}")
+            logger.error("Error getting quizzes: %s", e)
             return []
 
     def get_quiz_with_questions(self, quiz_id: int, user_id: int = None) -> Optional[Dict]:
         """Get quiz with all its questions"""
+        cached = self._quiz_cache.get((quiz_id, user_id))
+        if cached is not None:
+            return {**cached, 'questions': [dict(q) for q in cached['questions']]}
+        
         try:
-            with self.get_connection() as connection:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor(dictionary=True)
                 
-                # Get quiz details
+                # Quiz and its questions in one round trip; a quiz without questions yields one row of NULLs
                 quiz_query = """
-                SELECT id, title, topic, difficulty, total_questions,
-                       time_limit, passing_score, created_at
-                FROM quizzes
-                WHERE id = %s
+                SELECT q.id, q.title, q.topic, q.difficulty, q.total_questions,
+                       q.time_limit, q.passing_score, q.created_at,
+                       qq.id AS question_id, qq.question, qq.question_type, qq.correct_answer,
+                       qq.options, qq.explanation, qq.difficulty AS question_difficulty, qq.points
+                FROM quizzes q
+                LEFT JOIN quiz_questions qq ON qq.quiz_id = q.id
+                WHERE q.id = %s
                 """
                 params = [quiz_id]
                 
                 if user_id:
-                    quiz_query += " AND user_id = %s"
+                    quiz_query += " AND q.user_id = %s"
                     params.append(user_id)
                 
+                quiz_query += " ORDER BY qq.id"
+                
                 cursor.execute(quiz_query, params)
-                quiz = cursor.fetchone()
+                rows = cursor.fetchall()
                 
-                if not quiz:
+                if not rows:
                     return None
                 
-                # Get quiz questions
-                questions_query = """
-                SELECT id, question, question_type, correct_answer, options,
-                       explanation, difficulty, points
-                FROM quiz_questions
-                WHERE quiz_id = %s
-                ORDER BY id
-                """
-                
-                cursor.execute(questions_query, (quiz_id,))
-                questions = cursor.fetchall()
-                
-                # Parse JSON options
-                for question in questions:
-                    if question['options']:
-                        question['options'] = json.loads(question['options'])
+                first = rows[0]
+                quiz = {key: first[key] for key in (
+                    'id', 'title', 'topic', 'difficulty', 'total_questions',
+                    'time_limit', 'passing_score', 'created_at'
+                )}
+                
+                quiz['questions'] = [
+                    {
+                        'id': row['question_id'],
+                        'question': row['question'],
+                        'question_type': row['question_type'],
+                        'correct_answer': row['correct_answer'],
+                        'options': _json_loads(row['options']) if row['options'] else row['options'],
+                        'explanation': row['explanation'],
+                        'difficulty': row['question_difficulty'],
+                        'points': row['points']
+                    }
+                    for row in rows if row['question_id'] is not None
+                ]
                 
-                quiz['questions'] = questions
-                return quiz
+                self._quiz_cache.set((quiz_id, user_id), quiz)
+                return {**quiz, 'questions': [dict(q) for q in quiz['questions']]}
                 
         except Error as e:
-            logger.error(f"Error getting quiz with questions: {e}")
+            logger.error("Error getting quiz with questions: %s", e)
             return None
 
     def get_user_conversations(self, user_id: int, limit: int = None) -> List[Dict]:
         """Get user's conversations"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection, dictionary=True)
                 
                 query = """
                 SELECT id, title, topic, created_at, updated_at
@@ -1120,14 +2040,14 @@ class DatabaseManager:
                 return cursor.fetchall()
                 
         except Error as e:
-            logger.error(f"Error getting conversations: {e}")
+            logger.error("Error getting conversations: %s", e)
             return []
 
     def get_conversation_messages(self, conversation_id: int, user_id: int = None) -> List[Dict]:
         """Get messages from a conversation"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection, dictionary=True)
                 
                 query = """
                 SELECT m.id, m.content, m.is_user, m.ai_model, m.confidence,
@@ -1148,14 +2068,14 @@ class DatabaseManager:
                 return cursor.fetchall()
                 
         except Error as e:
-            logger.error(f"Error getting conversation messages: {e}")
+            logger.error("Error getting conversation messages: %s", e)
             return []
 
     def get_user_files(self, user_id: int, processed_only: bool = False) -> List[Dict]:
         """Get user's uploaded files"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection, dictionary=True)
                 
                 query = """
                 SELECT id, filename, original_filename, file_type, file_size,
@@ -1175,14 +2095,18 @@ class DatabaseManager:
                 return cursor.fetchall()
                 
         except Error as e:
-            logger.error(f"Error getting user files: {e}")
+            logger.error("Error getting user files: %s", e)
             return []
 
     def get_user_progress(self, user_id: int, topic: str = None) -> List[Dict]:
         """Get user's learning progress"""
+        cached = self._progress_cache.get((user_id, topic))
+        if cached is not None:
+            return [dict(row) for row in cached]
+        
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection, dictionary=True)
                 
                 query = """
                 SELECT topic, total_study_time, flashcards_reviewed, quizzes_completed,
@@ -1200,56 +2124,60 @@ class DatabaseManager:
                 query += " ORDER BY mastery_level DESC, last_studied DESC"
                 
                 cursor.execute(query, params)
-                return cursor.fetchall()
+                progress = cursor.fetchall()
+                
+                self._progress_cache.set((user_id, topic), progress)
+                return [dict(row) for row in progress]
                 
         except Error as e:
-            logger.error(f"Error getting user progress: {e}")
+            logger.error("Error getting user progress: %s", e)
             return []
 
     def get_user_study_stats(self, user_id: int, days: int = 30) -> Dict:
         """Get user's study statistics for the last N days"""
         try:
-            with self.get_connection() as connection:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor(dictionary=True)
                 
                 since_date = datetime.now() - timedelta(days=days)
                 
-                # Get study sessions stats
-                sessions_query = """
-                SELECT 
-                    COUNT(*) as total_sessions,
-                    SUM(time_spent) as total_time,
-                    SUM(items_studied) as total_items,
-                    SUM(correct_answers) as total_correct,
-                    AVG(accuracy) as avg_accuracy
-                FROM study_sessions
-                WHERE user_id = %s AND started_at >= %s
-                """
-                
-                cursor.execute(sessions_query, (user_id, since_date))
-                sessions_stats = cursor.fetchone()
-                
-                # Get flashcard stats
-                flashcards_query = """
-                SELECT COUNT(*) as total_flashcards
-                FROM flashcards
-                WHERE user_id = %s AND created_at >= %s
+                # All three aggregates in one round trip; each derived table yields exactly one row
+                stats_query = """
+                SELECT s.total_sessions, s.total_time, s.total_items, s.total_correct, s.avg_accuracy,
+                       f.total_flashcards,
+                       q.total_attempts, q.avg_score
+                FROM (
+                    SELECT 
+                        COUNT(*) as total_sessions,
+                        SUM(time_spent) as total_time,
+                        SUM(items_studied) as total_items,
+                        SUM(correct_answers) as total_correct,
+                        AVG(accuracy) as avg_accuracy
+                    FROM study_sessions
+                    WHERE user_id = %s AND started_at >= %s
+                ) s
+                CROSS JOIN (
+                    SELECT COUNT(*) as total_flashcards
+                    FROM flashcards
+                    WHERE user_id = %s AND created_at >= %s
+                ) f
+                CROSS JOIN (
+                    SELECT 
+                        COUNT(*) as total_attempts,
+                        AVG(percentage) as avg_score
+                    FROM quiz_attempts
+                    WHERE user_id = %s AND started_at >= %s
+                ) q
                 """
                 
-                cursor.execute(flashcards_query, (user_id, since_date))
-                flashcards_stats = cursor.fetchone()
-                
-                # Get quiz stats
-                quiz_attempts_query = """
-                SELECT 
-                    COUNT(*) as total_attempts,
-                    AVG(percentage) as avg_score
-                FROM quiz_attempts
-                WHERE user_id = %s AND started_at >= %s
-                """
+                cursor.execute(stats_query, (user_id, since_date) * 3)
+                stats = cursor.fetchone()
                 
-                cursor.execute(quiz_attempts_query, (user_id, since_date))
-                quiz_stats = cursor.fetchone()
+                sessions_stats = {key: stats[key] for key in (
+                    'total_sessions', 'total_time', 'total_items', 'total_correct', 'avg_accuracy'
+                )}
+                flashcards_stats = {'total_flashcards': stats['total_flashcards']}
+                quiz_stats = {key: stats[key] for key in ('total_attempts', 'avg_score')}
                 
                 return {
                     'period_days': days,
@@ -1259,7 +2187,7 @@ class DatabaseManager:
                 }
                 
         except Error as e:
-            logger.error(f"Error getting user study stats: {e}")
+            logger.error("Error getting user study stats: %s", e)
             return {}
 
     # =============================================================================
@@ -1271,13 +2199,12 @@ class DatabaseManager:
         """Create a new study session"""
         try:
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 query = """
                 INSERT INTO study_sessions (user_id, session_type, topic, difficulty_level)
                 VALUES (%s, %s, %s, %s)
                 """
                 
+                cursor = self.prepared_cursor(connection, query)
                 cursor.execute(query, (user_id, session_type, topic, difficulty_level))
                 session_id = cursor.lastrowid
                 connection.commit()
@@ -1285,142 +2212,160 @@ class DatabaseManager:
                 return session_id
                 
         except Error as e:
-            logger.error(f"Error creating study session: {e}")
+            logger.error("Error creating study session: %s", e)
             return None
 
     def update_study_session(self, session_id: int, items_studied: int = None,
                            correct_answers: int = None, time_spent: int = None,
                            accuracy: float = None):
         """Update study session with progress data"""
+        if items_studied is None and correct_answers is None and time_spent is None and accuracy is None:
+            return
+        
         try:
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
-                updates = []
-                params = []
-                
-                if items_studied is not None:
-                    updates.append("items_studied = %s")
-                    params.append(items_studied)
-                
-                if correct_answers is not None:
-                    updates.append("correct_answers = %s")
-                    params.append(correct_answers)
-                
-                if time_spent is not None:
-                    updates.append("time_spent = %s")
-                    params.append(time_spent)
-                
-                if accuracy is not None:
-                    updates.append("accuracy = %s")
-                    params.append(accuracy)
+                # One fixed statement for every field subset; None keeps the current value
+                query = """
+                UPDATE study_sessions
+                SET items_studied = COALESCE(%s, items_studied),
+                    correct_answers = COALESCE(%s, correct_answers),
+                    time_spent = COALESCE(%s, time_spent),
+                    accuracy = COALESCE(%s, accuracy),
+                    ended_at = NOW()
+                WHERE id = %s
+                """
                 
-                if updates:
-                    updates.append("ended_at = %s")
-                    params.extend([datetime.now(), session_id])
-                    
-                    query = f"UPDATE study_sessions SET {', '.join(updates)} WHERE id = %s"
-                    cursor.execute(query, params)
-                    connection.commit()
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (items_studied, correct_answers, time_spent, accuracy, session_id))
+                connection.commit()
                 
         except Error as e:
-            logger.error(f"Error updating study session: {e}")
+            logger.error("Error updating study session: %s", e)
 
     def update_flashcard_review(self, flashcard_id: int, correct: bool):
         """Update flashcard review statistics"""
+        try:
+            with self.get_connection() as connection:
+                # SET is applied left to right, so mastery_level sees the new counters
+                query = """
+                UPDATE flashcards 
+                SET times_reviewed = times_reviewed + 1,
+                    times_correct = times_correct + %s,
+                    mastery_level = times_correct / times_reviewed,
+                    last_reviewed = NOW()
+                WHERE id = %s
+                """
+                
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (int(correct), flashcard_id))
+                connection.commit()
+                
+        except Error as e:
+            logger.error("Error updating flashcard review: %s", e)
+
+    def update_flashcard_reviews_bulk(self, reviews: List[Tuple[int, bool]]):
+        """
+        Record a batch of flashcard reviews with a single UPDATE
+        
+        Args:
+            reviews: (flashcard_id, correct) pairs; a card may appear more than once
+        """
+        if not reviews:
+            return
+        
+        # Fold repeated reviews of the same card into per-card totals
+        totals: Dict[int, List[int]] = {}
+        for flashcard_id, correct in reviews:
+            counts = totals.setdefault(flashcard_id, [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if correct else 0
+        
         try:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                # Get current stats
-                cursor.execute(
-                    "SELECT times_reviewed, times_correct FROM flashcards WHERE id = %s",
-                    (flashcard_id,)
-                )
-                result = cursor.fetchone()
+                arms = " ".join(["WHEN %s THEN %s"] * len(totals))
+                placeholders = ", ".join(["%s"] * len(totals))
+                
+                # SET is applied left to right, so mastery_level sees the new counters
+                query = f"""
+                UPDATE flashcards
+                SET times_reviewed = times_reviewed + CASE id {arms} END,
+                    times_correct = times_correct + CASE id {arms} END,
+                    mastery_level = times_correct / times_reviewed,
+                    last_reviewed = NOW()
+                WHERE id IN ({placeholders})
+                """
                 
-                if result:
-                    times_reviewed = result[0] + 1
-                    times_correct = result[1] + (1 if correct else 0)
-                    mastery_level = times_correct / times_reviewed if times_reviewed > 0 else 0
-                    
-                    query = """
-                    UPDATE flashcards 
-                    SET times_reviewed = %s, times_correct = %s, mastery_level = %s,
-                        last_reviewed = %s
-                    WHERE id = %s
-                    """
-                    
-                    cursor.execute(query, (
-                        times_reviewed, times_correct, mastery_level,
-                        datetime.now(), flashcard_id
-                    ))
-                    connection.commit()
+                params = list(itertools.chain.from_iterable((fid, c[0]) for fid, c in totals.items()))
+                params += list(itertools.chain.from_iterable((fid, c[1]) for fid, c in totals.items()))
+                params += list(totals)
+                
+                cursor.execute(query, params)
+                connection.commit()
                 
         except Error as e:
-            logger.error(f"Error updating flashcard review: {e}")
+            logger.error("Error updating flashcard reviews: %s", e)
 
     def update_user_progress(self, user_id: int, topic: str, study_time: int = 0,
                            flashcards_reviewed: int = 0, quiz_completed: bool = False,
                            quiz_score: float = None):
         """Update or create user progress for a topic"""
+        self.upsert_progress(
+            user_id, topic,
+            study_time=study_time,
+            flashcards_reviewed=flashcards_reviewed,
+            quizzes_completed=1 if quiz_completed else 0,
+            quiz_score=quiz_score if quiz_completed else None
+        )
+
+    def upsert_progress(self, user_id: int, topic: str, study_time: int = 0,
+                        flashcards_reviewed: int = 0, quizzes_completed: int = 0,
+                        quiz_score: float = None, mastery_level: float = None):
+        """
+        Add study activity to a user's progress for a topic in one statement
+        
+        Creates the row on first use (unique_user_topic) and otherwise
+        accumulates counters, folds quiz_score into the running average and
+        replaces mastery_level when given, all without reading the row first.
+        """
         try:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                # Check if progress record exists
-                cursor.execute(
-                    "SELECT id, average_score, quizzes_completed FROM user_progress WHERE user_id = %s AND topic = %s",
-                    (user_id, topic)
-                )
-                existing = cursor.fetchone()
+                # average_score is assigned before quizzes_completed so it sees the old count
+                query = """
+                INSERT INTO user_progress (
+                    user_id, topic, total_study_time, flashcards_reviewed,
+                    quizzes_completed, average_score, mastery_level, last_studied
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, CURDATE())
+                ON DUPLICATE KEY UPDATE
+                    total_study_time = total_study_time + VALUES(total_study_time),
+                    flashcards_reviewed = flashcards_reviewed + VALUES(flashcards_reviewed),
+                    average_score = CASE
+                        WHEN %s THEN (average_score * quizzes_completed + VALUES(average_score))
+                                     / (quizzes_completed + VALUES(quizzes_completed))
+                        ELSE average_score
+                    END,
+                    quizzes_completed = quizzes_completed + VALUES(quizzes_completed),
+                    mastery_level = COALESCE(%s, mastery_level),
+                    last_studied = CURDATE()
+                """
                 
-                if existing:
-                    # Update existing record
-                    updates = ["total_study_time = total_study_time + %s"]
-                    params = [study_time]
-                    
-                    if flashcards_reviewed > 0:
-                        updates.append("flashcards_reviewed = flashcards_reviewed + %s")
-                        params.append(flashcards_reviewed)
-                    
-                    if quiz_completed:
-                        updates.append("quizzes_completed = quizzes_completed + 1")
-                        
-                        if quiz_score is not None:
-                            # Calculate new average score
-                            current_avg = existing[2] or 0
-                            quiz_count = existing[1] + 1
-                            new_avg = ((current_avg * existing[1]) + quiz_score) / quiz_count
-                            updates.append("average_score = %s")
-                            params.append(new_avg)
-                    
-                    updates.append("last_studied = %s")
-                    params.extend([datetime.now().date(), user_id, topic])
-                    
-                    query = f"UPDATE user_progress SET {', '.join(updates)} WHERE user_id = %s AND topic = %s"
-                    cursor.execute(query, params)
-                    
-                else:
-                    # Create new progress record
-                    query = """
-                    INSERT INTO user_progress (
-                        user_id, topic, total_study_time, flashcards_reviewed,
-                        quizzes_completed, average_score, last_studied
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    cursor.execute(query, (
-                        user_id, topic, study_time, flashcards_reviewed,
-                        1 if quiz_completed else 0,
-                        quiz_score if quiz_score is not None else 0.0,
-                        datetime.now().date()
-                    ))
+                has_score = quiz_score is not None and quizzes_completed > 0
+                cursor.execute(query, (
+                    user_id, topic, study_time, flashcards_reviewed, quizzes_completed,
+                    quiz_score if has_score else 0.0,
+                    mastery_level if mastery_level is not None else 0.0,
+                    has_score, mastery_level
+                ))
                 
                 connection.commit()
                 
+                self._progress_cache.discard_where(lambda key: key[0] == user_id)
+                
         except Error as e:
-            logger.error(f"Error updating user progress: {e}")
+            logger.error("Error updating user progress: %s", e)
 
     # =============================================================================
     # QUIZ ATTEMPTS AND SCORING
@@ -1430,21 +2375,20 @@ class DatabaseManager:
         """Create a new quiz attempt"""
         try:
             with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
                 query = """
                 INSERT INTO quiz_attempts (quiz_id, user_id, answers)
                 VALUES (%s, %s, %s)
                 """
                 
-                cursor.execute(query, (quiz_id, user_id, json.dumps({})))
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (quiz_id, user_id, '{}'))
                 attempt_id = cursor.lastrowid
                 connection.commit()
                 
                 return attempt_id
                 
         except Error as e:
-            logger.error(f"Error creating quiz attempt: {e}")
+            logger.error("Error creating quiz attempt: %s", e)
             return None
 
     def submit_quiz_attempt(self, attempt_id: int, answers: Dict, score: float,
@@ -1462,7 +2406,7 @@ class DatabaseManager:
                 """
                 
                 cursor.execute(query, (
-                    json.dumps(answers), score, percentage, time_taken,
+                    _json_dumps(answers), score, percentage, time_taken,
                     datetime.now(), attempt_id
                 ))
                 
@@ -1472,37 +2416,66 @@ class DatabaseManager:
                 return success
                 
         except Error as e:
-            logger.error(f"Error submitting quiz attempt: {e}")
+            logger.error("Error submitting quiz attempt: %s", e)
             return False
 
-    def get_quiz_attempts(self, user_id: int, quiz_id: int = None) -> List[Dict]:
-        """Get quiz attempts for a user"""
+    def get_quiz_attempts(self, user_id: int, quiz_id: int = None) -> List[QuizAttemptRow]:
+        """Get quiz attempts for a user, as QuizAttemptRow tuples (use ._asdict() for a dict)"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
-                
-                query = """
-                SELECT qa.id, qa.quiz_id, q.title as quiz_title, qa.score,
-                       qa.percentage, qa.time_taken, qa.started_at, qa.completed_at
-                FROM quiz_attempts qa
-                JOIN quizzes q ON qa.quiz_id = q.id
-                WHERE qa.user_id = %s
-                """
-                params = [user_id]
-                
-                if quiz_id:
-                    query += " AND qa.quiz_id = %s"
-                    params.append(quiz_id)
-                
-                query += " ORDER BY qa.started_at DESC"
-                
-                cursor.execute(query, params)
-                return cursor.fetchall()
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.cached_cursor(connection)
+                cursor.execute(*self._quiz_attempts_query(user_id, quiz_id))
+                return list(map(QuizAttemptRow._make, cursor.fetchall()))
                 
         except Error as e:
-            logger.error(f"Error getting quiz attempts: {e}")
+            logger.error("Error getting quiz attempts: %s", e)
             return []
 
+    def iter_quiz_attempts(self, user_id: int, quiz_id: int = None, chunk: int = 500) -> Iterator[QuizAttemptRow]:
+        """
+        Stream a user's quiz attempts without loading them all into memory
+        
+        Same rows as get_quiz_attempts, read from an unbuffered cursor chunk
+        rows at a time. The connection is held until the generator is
+        exhausted or closed.
+        """
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = connection.cursor(buffered=False)
+                try:
+                    cursor.execute(*self._quiz_attempts_query(user_id, quiz_id))
+                    
+                    while True:
+                        batch = cursor.fetchmany(chunk)
+                        if not batch:
+                            break
+                        yield from map(QuizAttemptRow._make, batch)
+                finally:
+                    # Discards any unread rows so the connection goes back to the pool clean
+                    cursor.close()
+                
+        except Error as e:
+            logger.error("Error streaming quiz attempts: %s", e)
+
+    @staticmethod
+    def _quiz_attempts_query(user_id: int, quiz_id: int = None) -> Tuple[str, List]:
+        """SELECT for a user's quiz attempts, newest first, in QuizAttemptRow column order"""
+        query = """
+        SELECT qa.id, qa.quiz_id, q.title as quiz_title, qa.score,
+               qa.percentage, qa.time_taken, qa.started_at, qa.completed_at
+        FROM quiz_attempts qa
+        JOIN quizzes q ON qa.quiz_id = q.id
+        WHERE qa.user_id = %s
+        """
+        params = [user_id]
+        
+        if quiz_id:
+            query += " AND qa.quiz_id = %s"
+            params.append(quiz_id)
+        
+        query += " ORDER BY qa.started_at DESC"
+        return query, params
+
     # =============================================================================
     # FILE UPLOAD MANAGEMENT
     # =============================================================================
@@ -1511,9 +2484,7 @@ class DatabaseManager:
                            file_type: str, file_size: int, file_path: str) -> Optional[int]:
         """Record an uploaded file"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
+            with self.get_connection(autocommit=True) as connection:
                 query = """
                 INSERT INTO uploaded_files (
                     user_id, filename, original_filename, file_type,
@@ -1521,18 +2492,72 @@ class DatabaseManager:
                 ) VALUES (%s, %s, %s, %s, %s, %s)
                 """
                 
+                cursor = self.prepared_cursor(connection, query)
                 cursor.execute(query, (
                     user_id, filename, original_filename, file_type,
                     file_size, file_path
                 ))
                 
+                return cursor.lastrowid
+                
+        except Error as e:
+            logger.error("Error creating uploaded file record: %s", e)
+            return None
+
+    def upsert_uploaded_file(self, user_id: int, filename: str, original_filename: str,
+                             file_type: str, file_size: int, file_path: str,
+                             content: str = None, content_summary: str = None,
+                             processed: bool = False, processing_error: str = None,
+                             flashcards_generated: int = 0,
+                             quiz_questions_generated: int = 0) -> Optional[int]:
+        """
+        Record an uploaded file together with its processing results
+        
+        One statement replaces create_uploaded_file + update_file_processing
+        when the file is processed before it is recorded. An existing row for
+        the same (user_id, filename) gets the processing columns updated.
+        
+        Returns:
+            ID of the new or updated row
+        """
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                # LAST_INSERT_ID(id) makes lastrowid report the existing row on update
+                query = """
+                INSERT INTO uploaded_files (
+                    user_id, filename, original_filename, file_type, file_size, file_path,
+                    content, content_summary, processed, processing_error,
+                    flashcards_generated, quiz_questions_generated, processed_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                id = LAST_INSERT_ID(id),
+                content = VALUES(content),
+                content_summary = VALUES(content_summary),
+                processed = VALUES(processed),
+                processing_error = VALUES(processing_error),
+                flashcards_generated = VALUES(flashcards_generated),
+                quiz_questions_generated = VALUES(quiz_questions_generated),
+                processed_at = VALUES(processed_at)
+                """
+                
+                cursor = self.prepared_cursor(connection, query)
+                cursor.execute(query, (
+                    user_id, filename, original_filename, file_type, file_size, file_path,
+                    content, content_summary, processed, processing_error,
+                    flashcards_generated, quiz_questions_generated,
+                    datetime.now() if processed else None
+                ))
                 file_id = cursor.lastrowid
-                connection.commit()
+                
+                if processed:
+                    self._queue_search_document('files', file_id, user_id=user_id,
+                                                original_filename=original_filename,
+                                                content=content, content_summary=content_summary)
                 
                 return file_id
                 
         except Error as e:
-            logger.error(f"Error creating uploaded file record: {e}")
+            logger.error("Error saving uploaded file record: %s", e)
             return None
 
     def update_file_processing(self, file_id: int, content: str = None,
@@ -1560,8 +2585,12 @@ class DatabaseManager:
                 
                 connection.commit()
                 
+                if processed:
+                    self._queue_search_document('files', file_id, content=content,
+                                                content_summary=content_summary)
+                
         except Error as e:
-            logger.error(f"Error updating file processing: {e}")
+            logger.error("Error updating file processing: %s", e)
 
     # =============================================================================
     # CONVERSATION AND MESSAGING
@@ -1586,7 +2615,7 @@ class DatabaseManager:
                 return conversation_id
                 
         except Error as e:
-            logger.error(f"Error creating conversation: {e}")
+            logger.error("Error creating conversation: %s", e)
             return None
 
     def add_message(self, conversation_id: int, content: str, is_user: bool,
@@ -1594,34 +2623,23 @@ class DatabaseManager:
                    processing_time: float = None) -> Optional[int]:
         """Add a message to a conversation"""
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
-                query = """
-                INSERT INTO messages (
-                    conversation_id, content, is_user, ai_model,
-                    confidence, processing_time
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                
-                cursor.execute(query, (
+            # A single autocommitted INSERT; the trigger updates the conversation in the same statement
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.prepared_cursor(connection, _ADD_MESSAGE_SQL)
+                cursor.execute(_ADD_MESSAGE_SQL, (
                     conversation_id, content, is_user, ai_model,
                     confidence, processing_time
                 ))
                 
                 message_id = cursor.lastrowid
                 
-                # Update conversation updated_at
-                cursor.execute(
-                    "UPDATE conversations SET updated_at = %s WHERE id = %s",
-                    (datetime.now(), conversation_id)
-                )
-                
-                connection.commit()
+                # conversations.updated_at is bumped by the messages_ai trigger
+                self._queue_search_document('conversations', message_id, conversation_id=conversation_id,
+                                            content=content, is_user=is_user)
                 return message_id
                 
         except Error as e:
-            logger.error(f"Error adding message: {e}")
+            logger.error("Error adding message: %s", e)
             return None
 
     # =============================================================================
@@ -1629,22 +2647,27 @@ class DatabaseManager:
     # =============================================================================
     
     def get_setting(self, key: str, default: str = None) -> str:
-        """Get application setting value"""
-        try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
-                cursor.execute(
-                    "SELECT setting_value FROM app_settings WHERE setting_key = %s",
-                    (key,)
-                )
-                result = cursor.fetchone()
-                
-                return result[0] if result else default
-                
-        except Error as e:
-            logger.error(f"Error getting setting: {e}")
-            return default
+        """Get application setting value (served from the in-process settings cache)"""
+        with self._settings_lock:
+            if time.monotonic() >= self._settings_expiry:
+                try:
+                    with self.get_connection(autocommit=True) as connection:
+                        cursor = connection.cursor()
+                        cursor.execute(_SETTINGS_SQL)
+                        self._settings_cache = dict(cursor.fetchall())
+                        self._settings_expiry = time.monotonic() + self._settings_ttl
+                        self._plan_limits_cache = {}
+                except Error as e:
+                    logger.error("Error getting setting: %s", e)
+                    return default
+            
+            return self._settings_cache.get(key, default)
+
+    def invalidate_settings_cache(self):
+        """Force the next get_setting call to reload app_settings"""
+        with self._settings_lock:
+            self._settings_expiry = 0.0
+            self._plan_limits_cache = {}
 
     def set_setting(self, key: str, value: str, description: str = None) -> bool:
         """Set application setting value"""
@@ -1663,142 +2686,286 @@ class DatabaseManager:
                 cursor.execute(query, (key, value, description))
                 connection.commit()
                 
+                self.invalidate_settings_cache()
                 return True
                 
         except Error as e:
-            logger.error(f"Error setting application setting: {e}")
+            logger.error("Error setting application setting: %s", e)
             return False
 
     def log_audit_event(self, user_id: int = None, action: str = '', resource_type: str = None,
                        resource_id: int = None, ip_address: str = None,
                        user_agent: str = None, details: Dict = None):
-        """Log an audit event"""
+        """
+        Log an audit event
+        
+        The event is queued for the background writer; if the queue is full
+        it is written synchronously instead of being dropped.
+        """
+        row = (
+            user_id, action, resource_type, resource_id,
+            ip_address, user_agent, _pack_details(details)
+        )
+        
         try:
-            with self.get_connection() as connection:
+            self._audit_queue.put_nowait(row)
+        except queue.Full:
+            self._write_audit_rows([row])
+
+    def _audit_flush_loop(self):
+        """Background loop writing queued audit events every interval or batch size"""
+        while True:
+            rows = [self._audit_queue.get()]
+            deadline = time.monotonic() + self._audit_flush_interval
+            
+            while len(rows) < self._audit_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._audit_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._write_audit_rows(rows)
+
+    def flush_audit_log(self):
+        """Write all queued audit events now"""
+        rows = []
+        while True:
+            try:
+                rows.append(self._audit_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        for start in range(0, len(rows), self._audit_batch_size):
+            self._write_audit_rows(rows[start:start + self._audit_batch_size])
+
+    def _write_audit_rows(self, rows: List[Tuple]):
+        """Insert audit rows with a single multi-row INSERT"""
+        try:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor()
                 
-                query = """
-                INSERT INTO audit_logs (
-                    user_id, action, resource_type, resource_id,
-                    ip_address, user_agent, details
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                
-                cursor.execute(query, (
-                    user_id, action, resource_type, resource_id,
-                    ip_address, user_agent, json.dumps(details) if details else None
-                ))
-                
-                connection.commit()
+                query = _AUDIT_INSERT_PREFIX + ", ".join([_AUDIT_ROW_PLACEHOLDER] * len(rows))
+                cursor.execute(query, [value for row in rows for value in row])
                 
         except Error as e:
-            logger.error(f"Error logging audit event: {e}")
+            logger.error("Error logging audit event: %s", e)
 
     def check_rate_limit(self, ip_address: str, endpoint: str, limit: int = 100,
                         window_minutes: int = 60) -> bool:
-        """Check if IP address has exceeded rate limit for endpoint"""
+        """
+        Check if IP address has exceeded rate limit for endpoint
+        
+        Requests are counted in memory, or in Redis when it is configured so
+        the window is shared between processes. MySQL is only written when a
+        client first goes over the limit, recording the block in rate_limits.
+        A blocked client is refused until its window ends.
+        """
+        window = window_minutes * 60
+        
+        count = self._redis_rate_count(ip_address, endpoint, window)
+        if count is None:
+            count = self._local_rate_count(ip_address, endpoint, window)
+        
+        if count == limit + 1:
+            self._record_rate_block(ip_address, endpoint, count)
+        
+        return count <= limit
+
+    def _local_rate_count(self, ip_address: str, endpoint: str, window: int) -> int:
+        """Count a request against the in-process window for (ip, endpoint)"""
+        now = time.monotonic()
+        key = (ip_address, endpoint)
+        
+        with self._rate_lock:
+            entry = self._rate_windows.get(key)
+            if entry is None or entry[0] <= now:
+                entry = _start_rate_window(self._rate_windows, key, now + window, self._rate_max_keys)
+            entry[1] += 1
+            return entry[1]
+
+    def _redis_rate_count(self, ip_address: str, endpoint: str, window: int) -> Optional[int]:
+        """Count a request in Redis in one round trip; None without Redis or on Redis errors"""
+        if self.redis is None:
+            return None
+        
+        key = f"ratelimit:{endpoint}:{ip_address}"
         try:
-            with self.get_connection() as connection:
-                cursor = connection.cursor()
-                
-                window_start = datetime.now() - timedelta(minutes=window_minutes)
-                
-                # Get or create rate limit record
-                cursor.execute(
-                    """
-                    INSERT INTO rate_limits (ip_address, endpoint, window_start)
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    request_count = CASE 
-                        WHEN window_start < %s THEN 1
-                        ELSE request_count + 1
-                    END,
-                    window_start = CASE
-                        WHEN window_start < %s THEN %s
-                        ELSE window_start
-                    END
-                    """,
-                    (ip_address, endpoint, datetime.now(), window_start, window_start, datetime.now())
-                )
-                
-                # Check current count
-                cursor.execute(
-                    "SELECT request_count, is_blocked FROM rate_limits WHERE ip_address = %s AND endpoint = %s",
-                    (ip_address, endpoint)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    count, is_blocked = result
-                    
-                    # Block if over limit
-                    if count > limit and not is_blocked:
-                        cursor.execute(
-                            "UPDATE rate_limits SET is_blocked = TRUE WHERE ip_address = %s AND endpoint = %s",
-                            (ip_address, endpoint)
-                        )
-                        is_blocked = True
-                    
-                    connection.commit()
-                    return not is_blocked and count <= limit
-                
-                return True
+            pipe = self.redis.pipeline()
+            # SET NX starts the window with its expiry; INCR keeps the TTL
+            pipe.set(key, 0, ex=window, nx=True)
+            pipe.incr(key)
+            return pipe.execute()[1]
+        except redis.RedisError as e:
+            logger.warning("Redis rate limit failed, counting in process: %s", e)
+            return None
+
+    def _record_rate_block(self, ip_address: str, endpoint: str, count: int):
+        """Persist a client going over its limit"""
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = self.prepared_cursor(connection, _RATE_BLOCK_SQL)
+                cursor.execute(_RATE_BLOCK_SQL, (ip_address, endpoint, count, datetime.now()))
                 
         except Error as e:
-            logger.error(f"Error checking rate limit: {e}")
-            return True  # Allow on error
+            logger.error("Error recording rate limit block: %s", e)
+
+    CLEANUP_DELETE_CHUNK = 10000
+
+    def _delete_in_chunks(self, cursor, delete_sql: str, params: Tuple) -> int:
+        """
+        Run a DELETE ... LIMIT CLEANUP_DELETE_CHUNK until it stops finding rows
+        
+        The cursor must be on an autocommit connection so every chunk commits
+        on its own, keeping row locks and binlog events small.
+        """
+        deleted = 0
+        while True:
+            cursor.execute(f"{delete_sql} LIMIT {self.CLEANUP_DELETE_CHUNK}", params)
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.CLEANUP_DELETE_CHUNK:
+                return deleted
 
     def cleanup_expired_sessions(self):
         """Clean up expired sessions and other old data"""
         try:
-            with self.get_connection() as connection:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor()
                 
-                # Remove expired sessions
-                cursor.execute("DELETE FROM user_sessions WHERE expires_at < %s", (datetime.now(),))
-                expired_sessions = cursor.rowcount
+                # Remove expired sessions, oldest first along idx_expires
+                expired_sessions = self._delete_in_chunks(
+                    cursor,
+                    "DELETE FROM user_sessions WHERE expires_at < %s ORDER BY expires_at",
+                    (datetime.now(),)
+                )
                 
                 # Clean up old rate limit records
                 old_rate_limits = datetime.now() - timedelta(hours=24)
-                cursor.execute("DELETE FROM rate_limits WHERE window_start < %s", (old_rate_limits,))
-                old_rate_records = cursor.rowcount
-                
-                # Clean up old audit logs (keep last 90 days)
-                old_audit_date = datetime.now() - timedelta(days=90)
-                cursor.execute("DELETE FROM audit_logs WHERE timestamp < %s", (old_audit_date,))
-                old_audit_logs = cursor.rowcount
+                old_rate_records = self._delete_in_chunks(
+                    cursor,
+                    "DELETE FROM rate_limits WHERE window_start < %s ORDER BY window_start",
+                    (old_rate_limits,)
+                )
                 
-                connection.commit()
+                # Usage counters are only read for the current day
+                old_usage_days = self._delete_in_chunks(
+                    cursor,
+                    "DELETE FROM user_daily_usage WHERE day < UTC_DATE() - INTERVAL 30 DAY ORDER BY day",
+                    ()
+                )
                 
-                logger.info(f"Cleanup completed: {expired_sessions} sessions, {old_rate_records} rate records, {old_audit_logs} audit logs")
+                logger.info("Cleanup completed: %s sessions, %s rate records, %s usage rows",
+                            expired_sessions, old_rate_records, old_usage_days)
+            
+            # Old audit logs (and session partitions) are dropped rather than deleted
+            self.rotate_partitions()
                 
         except Error as e:
-            logger.error(f"Error during cleanup: {e}")
+            logger.error("Error during cleanup: %s", e)
 
-    def get_database_stats(self) -> Dict:
-        """Get database statistics"""
+    def rotate_partitions(self, retention_days: int = 90) -> Dict[str, Dict[str, int]]:
+        """
+        Maintain the weekly partitions of audit_logs and user_sessions
+        
+        Splits partitions for the current and next week out of p_future and
+        drops partitions entirely older than retention_days. Run it at least
+        weekly (cleanup_expired_sessions calls it); DROP PARTITION discards a
+        week of rows without the table scan a DELETE needs.
+        
+        Returns:
+            Per-table counts of added and dropped partitions
+        """
+        today = datetime.utcnow().date()
+        next_monday = today + timedelta(days=7 - today.weekday())
+        bounds = [next_monday, next_monday + timedelta(days=7)]
+        cutoff = today - timedelta(days=retention_days)
+        summary = {}
+        
         try:
             with self.get_connection() as connection:
                 cursor = connection.cursor()
                 
-                stats = {}
+                for table, to_bound in _PARTITIONED_TABLES.items():
+                    cursor.execute(
+                        """
+                        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+                        FROM information_schema.PARTITIONS
+                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                        """,
+                        (table,)
+                    )
+                    partitions = dict(cursor.fetchall())
+                    
+                    added = 0
+                    for bound in bounds:
+                        name = f"p{bound:%Y%m%d}"
+                        if name in partitions:
+                            continue
+                        cursor.execute(
+                            f"ALTER TABLE {table} REORGANIZE PARTITION p_future INTO ("
+                            f"PARTITION {name} VALUES LESS THAN ({to_bound(bound)}), "
+                            f"PARTITION p_future VALUES LESS THAN MAXVALUE)"
+                        )
+                        added += 1
+                    
+                    expired = [
+                        name for name, description in partitions.items()
+                        if name != 'p_future' and int(description) <= to_bound(cutoff)
+                    ]
+                    if expired:
+                        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+                    
+                    summary[table] = {'added': added, 'dropped': len(expired)}
+                
+                logger.info("Partition rotation completed: %s", summary)
+                return summary
                 
-                # Count records in main tables
-                tables = [
-                    'users', 'user_sessions', 'conversations', 'messages',
-                    'flashcards', 'quizzes', 'quiz_questions', 'quiz_attempts',
-                    'uploaded_files', 'study_sessions', 'user_progress',
-                    'generation_sessions', 'audit_logs'
-                ]
+        except Error as e:
+            logger.error("Error rotating partitions: %s", e)
+            return summary
+
+    def get_database_stats(self, fast: bool = False) -> Dict:
+        """
+        Get database statistics
+        
+        Args:
+            fast: Read InnoDB's approximate row counts from information_schema
+                  instead of counting every table (no scans, but estimates)
+        """
+        # Count records in main tables
+        tables = [
+            'users', 'user_sessions', 'conversations', 'messages',
+            'flashcards', 'quizzes', 'quiz_questions', 'quiz_attempts',
+            'uploaded_files', 'study_sessions', 'user_progress',
+            'generation_sessions', 'audit_logs'
+        ]
+        
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = connection.cursor()
                 
-                for table in tables:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    stats[f"{table}_count"] = cursor.fetchone()[0]
+                if fast:
+                    cursor.execute(
+                        f"""
+                        SELECT table_name, table_rows
+                        FROM information_schema.tables
+                        WHERE table_schema = %s AND table_name IN ({', '.join(['%s'] * len(tables))})
+                        """,
+                        [self.config['database'], *tables]
+                    )
+                    counts = dict(cursor.fetchall())
+                    return {f"{table}_count": int(counts.get(table) or 0) for table in tables}
                 
-                return stats
+                # One row of exact counts; table names are the fixed list above, never user input
+                cursor.execute("SELECT " + ", ".join(
+                    f"(SELECT COUNT(*) FROM {table}) AS {table}_count" for table in tables
+                ))
+                return dict(zip(cursor.column_names, cursor.fetchone()))
                 
         except Error as e:
-            logger.error(f"Error getting database stats: {e}")
+            logger.error("Error getting database stats: %s", e)
             return {}
 
     def search_content(self, user_id: int, query: str, content_type: str = 'all', limit: int = 20) -> Dict:
@@ -1814,64 +2981,128 @@ class DatabaseManager:
         Returns:
             Dictionary with search results by category
         """
+        categories = [name for name in _SEARCH_QUERIES if content_type in (name, 'all')]
+        if not categories:
+            return {}
+        
+        if self.search_index is not None:
+            results = self._search_index_content(user_id, query, categories, limit)
+            if results is not None:
+                return results
+        
         try:
-            results = {}
-            
-            with self.get_connection() as connection:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor(dictionary=True)
                 
-                if content_type in ['flashcards', 'all']:
-                    # Search flashcards
-                    flashcard_query = """
-                    SELECT id, question, answer, topic, created_at,
-                           MATCH(question, answer) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
-                    FROM flashcards
-                    WHERE user_id = %s AND MATCH(question, answer) AGAINST(%s IN NATURAL LANGUAGE MODE)
-                    ORDER BY relevance DESC
-                    LIMIT %s
-                    """
-                    
-                    cursor.execute(flashcard_query, (query, user_id, query, limit))
-                    results['flashcards'] = cursor.fetchall()
-                
-                if content_type in ['conversations', 'all']:
-                    # Search conversation messages
-                    message_query = """
-                    SELECT m.id, m.content, m.is_user, m.timestamp, c.title as conversation_title,
-                           MATCH(m.content) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
-                    FROM messages m
-                    JOIN conversations c ON m.conversation_id = c.id
-                    WHERE c.user_id = %s AND MATCH(m.content) AGAINST(%s IN NATURAL LANGUAGE MODE)
-                    ORDER BY relevance DESC
-                    LIMIT %s
-                    """
-                    
-                    cursor.execute(message_query, (query, user_id, query, limit))
-                    results['conversations'] = cursor.fetchall()
-                
-                if content_type in ['files', 'all']:
-                    # Search file content
-                    file_query = """
-                    SELECT id, original_filename, content_summary, uploaded_at,
-                           MATCH(content) AGAINST(%s IN NATURAL LANGUAGE MODE) as relevance
-                    FROM uploaded_files
-                    WHERE user_id = %s AND processed = TRUE 
-                    AND MATCH(content) AGAINST(%s IN NATURAL LANGUAGE MODE)
-                    ORDER BY relevance DESC
-                    LIMIT %s
-                    """
-                    
-                    cursor.execute(file_query, (query, user_id, query, limit))
-                    results['files'] = cursor.fetchall()
+                # All selected searches in one round trip; result sets come back in order
+                combined = ";".join(_SEARCH_QUERIES[name] for name in categories)
+                params = (query, user_id, query, limit) * len(categories)
+                
+                results = {}
+                for name, result in zip(categories, cursor.execute(combined, params, multi=True)):
+                    results[name] = result.fetchall()
                 
                 return results
                 
         except Error as e:
-            logger.error(f"Error searching content: {e}")
+            logger.error("Error searching content: %s", e)
             return {}
 
+    def _search_index_content(self, user_id: int, query: str, categories: List[str],
+                              limit: int) -> Optional[Dict]:
+        """Run search_content against the external index; None on errors so MySQL is used"""
+        try:
+            response = self.search_client.multi_search([
+                {
+                    'indexUid': self.search_index.uid,
+                    'q': query,
+                    'filter': f'user_id = {int(user_id)} AND type = "{name}"',
+                    'limit': limit
+                }
+                for name in categories
+            ])
+        except meilisearch.errors.MeilisearchError as e:
+            logger.warning("Search index query failed, falling back to MySQL: %s", e)
+            return None
+        
+        return {
+            name: [{**hit, 'id': hit['record_id']} for hit in result['hits']]
+            for name, result in zip(categories, response['results'])
+        }
+
+    def _queue_search_document(self, doc_type: str, record_id: int, **fields):
+        """Queue a record for the external search index (no-op without one)"""
+        if self.search_index is None or record_id is None:
+            return
+        
+        try:
+            self._search_queue.put_nowait({
+                'id': f"{doc_type}-{record_id}", 'type': doc_type, 'record_id': record_id, **fields
+            })
+        except queue.Full:
+            logger.warning("Search index queue full, dropping %s %s", doc_type, record_id)
+
+    def _search_flush_loop(self):
+        """Background loop pushing queued documents every interval or batch size"""
+        while True:
+            docs = [self._search_queue.get()]
+            deadline = time.monotonic() + self._search_flush_interval
+            
+            while len(docs) < self._search_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    docs.append(self._search_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._push_search_documents(docs)
+
+    def _push_search_documents(self, docs: List[Dict]):
+        """Fill in owners for messages and files, then add the batch to the index"""
+        owners = {
+            'conversations': ("SELECT id, user_id, title FROM conversations WHERE id IN ({})",
+                              'conversation_id', 'conversation_title'),
+            'files': ("SELECT id, user_id, original_filename FROM uploaded_files WHERE id IN ({})",
+                      'record_id', 'original_filename')
+        }
+        
+        try:
+            with self.get_connection(autocommit=True) as connection:
+                cursor = connection.cursor()
+                
+                for doc_type, (sql, key, extra) in owners.items():
+                    pending = [doc for doc in docs if doc['type'] == doc_type and 'user_id' not in doc]
+                    ids = list({doc[key] for doc in pending})
+                    if not ids:
+                        continue
+                    
+                    cursor.execute(sql.format(', '.join(['%s'] * len(ids))), ids)
+                    found = {row[0]: row[1:] for row in cursor.fetchall()}
+                    for doc in pending:
+                        if doc[key] in found:
+                            doc['user_id'], doc[extra] = found[doc[key]]
+                
+        except Error as e:
+            logger.error("Error resolving search document owners: %s", e)
+        
+        # Documents whose owner could not be resolved are not searchable by user; skip them
+        docs = [doc for doc in docs if doc.get('user_id') is not None]
+        if not docs:
+            return
+        
+        try:
+            self.search_index.add_documents(docs, primary_key='id')
+        except meilisearch.errors.MeilisearchError as e:
+            logger.error("Error pushing documents to search index: %s", e)
+
     def get_user_plan_limits(self, plan: str) -> Dict:
-        """Get usage limits for a user plan"""
+        """Get usage limits for a user plan (memoized until the settings cache reloads)"""
+        cached = self._plan_limits_cache.get(plan)
+        if cached is not None and time.monotonic() < self._settings_expiry:
+            return dict(cached)
+        
         limits = {
             'free': {
                 'daily_chat_messages': int(self.get_setting('free_plan_daily_limit_chat', '10')),
@@ -1899,12 +3130,17 @@ class DatabaseManager:
             }
         }
         
-        return limits.get(plan, limits['free'])
+        plan_limits = limits.get(plan, limits['free'])
+        self._plan_limits_cache[plan] = plan_limits
+        return dict(plan_limits)
 
     def check_user_daily_usage(self, user_id: int, action: str) -> Dict:
         """
         Check user's daily usage for a specific action
         
+        Usage is counted per UTC calendar day, the same day the
+        user_daily_usage triggers write.
+        
         Args:
             user_id: User ID
             action: 'chat', 'flashcard_generation', 'file_upload'
@@ -1912,59 +3148,35 @@ class DatabaseManager:
         Returns:
             Dictionary with usage info: {'used': int, 'limit': int, 'can_proceed': bool}
         """
+        limit_keys = {
+            'chat': 'daily_chat_messages',
+            'flashcard_generation': 'daily_flashcard_generations',
+            'file_upload': 'daily_file_uploads'
+        }
+        
         try:
-            with self.get_connection() as connection:
+            with self.get_connection(autocommit=True) as connection:
                 cursor = connection.cursor()
                 
-                # Get user plan
-                cursor.execute("SELECT plan FROM users WHERE id = %s", (user_id,))
+                # User plan and today's counter in one primary-key lookup
+                cursor.execute(
+                    """
+                    SELECT u.plan, COALESCE(d.used, 0)
+                    FROM users u
+                    LEFT JOIN user_daily_usage d
+                        ON d.user_id = u.id AND d.day = UTC_DATE() AND d.action = %s
+                    WHERE u.id = %s
+                    """,
+                    (action, user_id)
+                )
+                
                 result = cursor.fetchone()
                 if not result:
                     return {'used': 0, 'limit': 0, 'can_proceed': False}
                 
-                plan = result[0]
+                plan, used = result
                 limits = self.get_user_plan_limits(plan)
-                
-                today = datetime.now().date()
-                used = 0
-                
-                if action == 'chat':
-                    # Count messages from user today
-                    query = """
-                    SELECT COUNT(*)
-                    FROM messages m
-                    JOIN conversations c ON m.conversation_id = c.id
-                    WHERE c.user_id = %s AND m.is_user = TRUE 
-                    AND DATE(m.timestamp) = %s
-                    """
-                    cursor.execute(query, (user_id, today))
-                    used = cursor.fetchone()[0]
-                    limit = limits['daily_chat_messages']
-                
-                elif action == 'flashcard_generation':
-                    # Count flashcard generation sessions today
-                    query = """
-                    SELECT COUNT(DISTINCT generation_session)
-                    FROM flashcards
-                    WHERE user_id = %s AND DATE(created_at) = %s
-                    """
-                    cursor.execute(query, (user_id, today))
-                    used = cursor.fetchone()[0]
-                    limit = limits['daily_flashcard_generations']
-                
-                elif action == 'file_upload':
-                    # Count file uploads today
-                    query = """
-                    SELECT COUNT(*)
-                    FROM uploaded_files
-                    WHERE user_id = %s AND DATE(uploaded_at) = %s
-                    """
-                    cursor.execute(query, (user_id, today))
-                    used = cursor.fetchone()[0]
-                    limit = limits['daily_file_uploads']
-                
-                else:
-                    limit = 0
+                limit = limits[limit_keys[action]] if action in limit_keys else 0
                 
                 can_proceed = limit == -1 or used < limit
                 
@@ -1976,17 +3188,179 @@ class DatabaseManager:
                 }
                 
         except Error as e:
-            logger.error(f"Error checking daily usage: {e}")
+            logger.error("Error checking daily usage: %s", e)
             return {'used': 0, 'limit': 0, 'can_proceed': False}
 
     def close_connection_pool(self):
         """Close the connection pool when shutting down"""
         try:
             if self.connection_pool:
-                # Close all connections in the pool
-                logger.info("Closing database connection pool")
+                self.flush_last_active()
+                self.flush_audit_log()
+                
+                # Close the idle connections of both pools; the pools don't do this themselves
+                closed = 0
+                for pool in (self.connection_pool, self.autocommit_pool):
+                    if pool:
+                        closed += pool._remove_connections()
+                
+                logger.info("Closed database connection pools (%s connections)", closed)
         except Exception as e:
-            logger.error(f"Error closing connection pool: {e}")
+            logger.error("Error closing connection pool: %s", e)
+
+
+class AsyncDatabaseManager:
+    """
+    asyncio counterpart of DatabaseManager for the request-serving hot paths
+    
+    Covers the per-request calls (chat messages, settings, rate limiting and
+    audit events) on an aiomysql pool so an event loop can keep many queries
+    in flight. Anything else can be run against a synchronous
+    DatabaseManager with run_sync, which moves it to the default executor.
+    """
+    
+    def __init__(self, config: Dict[str, Any], sync_db: 'DatabaseManager' = None):
+        """
+        Args:
+            config: Same dictionary as DatabaseManager, plus optional
+                    'async_pool_minsize' (5) and 'async_pool_maxsize' (20)
+            sync_db: DatabaseManager used by run_sync
+        """
+        if not HAS_AIOMYSQL:
+            raise RuntimeError("AsyncDatabaseManager requires the aiomysql package")
+        
+        self.config = config
+        self.sync_db = sync_db
+        self._pool_obj = None
+        self._pool_lock = asyncio.Lock()
+        
+        self._settings_cache: Dict[str, str] = {}
+        self._settings_expiry: float = 0.0
+        self._settings_ttl = config.get('settings_cache_ttl', 60)
+        
+        self._rate_windows: 'OrderedDict[Tuple[str, str], List]' = OrderedDict()
+        self._rate_max_keys = config.get('rate_limit_max_keys', 100000)
+    
+    async def _pool(self):
+        """Create the aiomysql pool on first use and return it"""
+        if self._pool_obj is None:
+            async with self._pool_lock:
+                if self._pool_obj is None:
+                    self._pool_obj = await aiomysql.create_pool(
+                        host=self.config['host'],
+                        port=self.config.get('port', 3306),
+                        db=self.config['database'],
+                        user=self.config['user'],
+                        password=self.config['password'],
+                        charset='utf8mb4',
+                        init_command="SET time_zone = '+00:00'",
+                        connect_timeout=self.config.get('connection_timeout', 10),
+                        autocommit=True,
+                        minsize=self.config.get('async_pool_minsize', 5),
+                        maxsize=self.config.get('async_pool_maxsize', 20)
+                    )
+        return self._pool_obj
+    
+    async def _execute(self, query: str, params: Tuple = None):
+        """Run one autocommitted statement; returns (lastrowid, rows)"""
+        pool = await self._pool()
+        async with pool.acquire() as conn, conn.cursor() as cur:
+            await cur.execute(query, params)
+            return cur.lastrowid, await cur.fetchall()
+    
+    async def run_sync(self, func, *args, **kwargs):
+        """Run a blocking call, e.g. a sync_db method, without stalling the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
+    async def add_message(self, conversation_id: int, content: str, is_user: bool,
+                          ai_model: str = 'huggingface', confidence: float = None,
+                          processing_time: float = None) -> Optional[int]:
+        """Add a message to a conversation (the messages_ai trigger touches the conversation)"""
+        try:
+            message_id, _ = await self._execute(
+                _ADD_MESSAGE_SQL,
+                (conversation_id, content, is_user, ai_model, confidence, processing_time)
+            )
+            return message_id
+            
+        except aiomysql.Error as e:
+            logger.error("Error adding message: %s", e)
+            return None
+    
+    async def get_setting(self, key: str, default: str = None) -> str:
+        """Get application setting value (served from an in-process copy of app_settings)"""
+        if time.monotonic() >= self._settings_expiry:
+            try:
+                _, rows = await self._execute(_SETTINGS_SQL)
+                self._settings_cache = dict(rows)
+                self._settings_expiry = time.monotonic() + self._settings_ttl
+            except aiomysql.Error as e:
+                logger.error("Error getting setting: %s", e)
+                return default
+        
+        return self._settings_cache.get(key, default)
+    
+    async def check_rate_limit(self, ip_address: str, endpoint: str, limit: int = 100,
+                               window_minutes: int = 60) -> bool:
+        """Check if IP address has exceeded rate limit for endpoint (see DatabaseManager.check_rate_limit)"""
+        now = time.monotonic()
+        key = (ip_address, endpoint)
+        
+        # Single-threaded event loop: no lock needed around the counters
+        entry = self._rate_windows.get(key)
+        if entry is None or entry[0] <= now:
+            entry = _start_rate_window(self._rate_windows, key, now + window_minutes * 60, self._rate_max_keys)
+        entry[1] += 1
+        
+        if entry[1] == limit + 1:
+            try:
+                await self._execute(_RATE_BLOCK_SQL, (ip_address, endpoint, entry[1], datetime.now()))
+            except aiomysql.Error as e:
+                logger.error("Error recording rate limit block: %s", e)
+        
+        return entry[1] <= limit
+    
+    async def log_audit_event(self, user_id: int = None, action: str = '', resource_type: str = None,
+                              resource_id: int = None, ip_address: str = None,
+                              user_agent: str = None, details: Dict = None):
+        """Log an audit event"""
+        try:
+            await self._execute(
+                _AUDIT_INSERT_PREFIX + _AUDIT_ROW_PLACEHOLDER,
+                (user_id, action, resource_type, resource_id,
+                 ip_address, user_agent, _pack_details(details))
+            )
+        except aiomysql.Error as e:
+            logger.error("Error logging audit event: %s", e)
+    
+    async def _search(self, name: str, params: Tuple) -> List[Dict]:
+        """Run one of search_content's FULLTEXT queries on its own pooled connection"""
+        pool = await self._pool()
+        async with pool.acquire() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(_SEARCH_QUERIES[name], params)
+            return list(await cur.fetchall())
+    
+    async def search_content(self, user_id: int, query: str, content_type: str = 'all',
+                             limit: int = 20) -> Dict:
+        """Search through user's content, running the category searches concurrently"""
+        categories = [name for name in _SEARCH_QUERIES if content_type in (name, 'all')]
+        params = (query, user_id, query, limit)
+        
+        try:
+            found = await asyncio.gather(*(self._search(name, params) for name in categories))
+            return dict(zip(categories, found))
+        except aiomysql.Error as e:
+            logger.error("Error searching content: %s", e)
+            return {}
+    
+    async def close(self):
+        """Close the aiomysql pool"""
+        if self._pool_obj is not None:
+            self._pool_obj.close()
+            await self._pool_obj.wait_closed()
+            self._pool_obj = None
+            logger.info("Async database pool closed")
 
 
 # =============================================================================
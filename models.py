@@ -1,59 +1,219 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import DDL, and_, case, event, func, insert, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import defer, selectinload
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime, timedelta
+import functools
 import json
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
 db = SQLAlchemy()
 
+class utcnow(FunctionElement):
+    """Naive UTC timestamp rendered per dialect, for server-side column defaults"""
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+@compiles(utcnow, 'mysql')
+def _mysql_utcnow(element, compiler, **kw):
+    return "(UTC_TIMESTAMP(6))"
+
+@compiles(utcnow, 'sqlite')
+def _sqlite_utcnow(element, compiler, **kw):
+    # SQLAlchemy's own text format (microseconds), so stored and bound values compare correctly
+    return "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+# Enum-like columns; same value sets as the MySQL schema in database.py, plus the
+# values the ORM helpers and ai_service actually write ('practice' questions, 'general' sessions)
+Difficulty = db.Enum('beginner', 'intermediate', 'advanced', 'mixed', name='difficulty')
+QuestionType = db.Enum('multiple_choice', 'true_false', 'short_answer', 'fill_blank', 'essay', 'practice',
+                       name='question_type')
+SessionType = db.Enum('flashcards', 'quiz', 'chat', 'practice', 'file_upload', 'general', name='session_type')
+
+# Loose spellings seen in request bodies and AI output, keyed in normalized form
+# (lower case, spaces and hyphens as underscores)
+_DIFFICULTY_ALIASES = {
+    'easy': 'beginner', 'basic': 'beginner', 'medium': 'intermediate', 'moderate': 'intermediate',
+    'hard': 'advanced', 'difficult': 'advanced', 'expert': 'advanced', 'mix': 'mixed'
+}
+_QUESTION_TYPE_ALIASES = {
+    'mcq': 'multiple_choice', 'multiple': 'multiple_choice', 'choice': 'multiple_choice',
+    'tf': 'true_false', 'true/false': 'true_false', 'truefalse': 'true_false', 'boolean': 'true_false',
+    'short': 'short_answer', 'open': 'short_answer', 'open_ended': 'short_answer',
+    'fill_in_the_blank': 'fill_blank', 'fill_in_the_blanks': 'fill_blank', 'fill_in': 'fill_blank', 'blank': 'fill_blank',
+    'long_answer': 'essay'
+}
+_SESSION_TYPE_ALIASES = {'flashcard': 'flashcards', 'quizzes': 'quiz', 'upload': 'file_upload'}
+
+def _enum_value(enum_type, aliases, value, default):
+    """value as one of enum_type's values (exact or aliased spelling), else default"""
+    if isinstance(value, str):
+        key = value.strip().lower().replace('-', '_').replace(' ', '_')
+        if key in enum_type.enums:
+            return key
+        if key in aliases:
+            return aliases[key]
+    return default
+
+def normalize_difficulty(value, default='intermediate'):
+    """Map a difficulty onto the Difficulty enum; unknown values give default"""
+    return _enum_value(Difficulty, _DIFFICULTY_ALIASES, value, default)
+
+def normalize_question_type(value, default='short_answer'):
+    """Map a question type onto the QuestionType enum; unknown values give default"""
+    return _enum_value(QuestionType, _QUESTION_TYPE_ALIASES, value, default)
+
+def normalize_session_type(value, default='general'):
+    """Map a session type onto the SessionType enum; unknown values give default"""
+    return _enum_value(SessionType, _SESSION_TYPE_ALIASES, value, default)
+
+# Native JSON column (JSONB on Postgres); the driver hands back Python lists/dicts
+JSONColumn = db.JSON().with_variant(JSONB(), 'postgresql')
+
+def json_dumps(obj):
+    """Serialize obj for JSON columns, with orjson when it is installed (engine json_serializer)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+def json_loads(data):
+    """Parse JSON column values, with orjson when it is installed (engine json_deserializer)"""
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+class PackedDict(TypeDecorator):
+    """Dict stored as a msgpack blob (JSON bytes without msgpack); reads back either encoding"""
+    impl = db.LargeBinary
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if HAS_MSGPACK:
+            return msgpack.packb(value)
+        return json_dumps(value).encode()
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return json_loads(value)
+        value = bytes(value)
+        # A msgpack map never starts with '{', so JSON rows (older or written without msgpack) still load
+        if value[:1] == b'{':
+            return json_loads(value)
+        if not HAS_MSGPACK:
+            raise RuntimeError("this value was written with msgpack, which is not installed")
+        return msgpack.unpackb(value, strict_map_key=False)
+
 class User(db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(255), unique=True, nullable=False)
+    email = db.Column(db.String(320), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_active = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    conversations = db.relationship('Conversation', backref='user', lazy=True, cascade='all, delete-orphan')
-    flashcards = db.relationship('Flashcard', backref='user', lazy=True, cascade='all, delete-orphan')
-    quizzes = db.relationship('Quiz', backref='user', lazy=True, cascade='all, delete-orphan')
-    study_sessions = db.relationship('StudySession', backref='user', lazy=True, cascade='all, delete-orphan')
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    last_active = db.Column(db.DateTime, server_default=utcnow())
+    
+    # Relationships; loaded on access, list helpers opt into selectinload per query since
+    # User is fetched on every login and these collections grow without bound
+    conversations = db.relationship('Conversation', back_populates='user', lazy='select', cascade='all, delete-orphan')
+    flashcards = db.relationship('Flashcard', back_populates='user', lazy='select', cascade='all, delete-orphan')
+    quizzes = db.relationship('Quiz', back_populates='user', lazy='select', cascade='all, delete-orphan')
+    study_sessions = db.relationship('StudySession', back_populates='user', lazy='select', cascade='all, delete-orphan')
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    title = db.Column(db.String(255), default='New Conversation')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    user = db.relationship('User', back_populates='conversations')
+    title = db.Column(db.String(120), default='New Conversation')
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=datetime.utcnow)
     
     # Relationships
-    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    messages = db.relationship('Message', back_populates='conversation', lazy='select', cascade='all, delete-orphan',
+                               order_by='Message.timestamp')
+    
+    # Serves get_user_conversations' filter + sort as an index range scan
+    __table_args__ = (db.Index('ix_conv_user_updated', user_id, updated_at.desc()),)
 
 class Message(db.Model):
     __tablename__ = 'messages'
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    conversation = db.relationship('Conversation', back_populates='messages')
     content = db.Column(db.Text, nullable=False)
     is_user = db.Column(db.Boolean, nullable=False)  # True for user, False for AI
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=utcnow())
     
     # Optional metadata
     ai_model = db.Column(db.String(100))  # Which AI model was used
     confidence = db.Column(db.Float)  # AI confidence score
     processing_time = db.Column(db.Float)  # Response time
+    
+    # Serves get_conversation_messages' filter + sort
+    __table_args__ = (db.Index('ix_msg_conv_ts', conversation_id, timestamp),)
+
+# Bump conversations.updated_at in the same statement as each message INSERT.
+# Installed with the messages table by db.create_all(); existing databases need the DDL run by hand.
+for _dialect, _statements in {
+    'postgresql': (
+        "CREATE OR REPLACE FUNCTION touch_conversation() RETURNS trigger AS $$ "
+        "BEGIN UPDATE conversations SET updated_at = NOW() AT TIME ZONE 'utc' "
+        "WHERE id = NEW.conversation_id; RETURN NEW; END; $$ LANGUAGE plpgsql",
+        "CREATE TRIGGER messages_touch_conversation AFTER INSERT ON messages "
+        "FOR EACH ROW EXECUTE FUNCTION touch_conversation()",
+    ),
+    'mysql': (
+        "CREATE TRIGGER messages_touch_conversation AFTER INSERT ON messages FOR EACH ROW "
+        "UPDATE conversations SET updated_at = UTC_TIMESTAMP(6) WHERE id = NEW.conversation_id",
+    ),
+    'sqlite': (
+        "CREATE TRIGGER messages_touch_conversation AFTER INSERT ON messages BEGIN "
+        "UPDATE conversations SET updated_at = strftime('%%Y-%%m-%%d %%H:%%M:%%f000', 'now') "
+        "WHERE id = NEW.conversation_id; END",
+    ),
+}.items():
+    for _statement in _statements:
+        event.listen(Message.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
 
 class Flashcard(db.Model):
     __tablename__ = 'flashcards'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user = db.relationship('User', back_populates='flashcards')
     question = db.Column(db.Text, nullable=False)
     answer = db.Column(db.Text, nullable=False)
     topic = db.Column(db.String(255))
-    difficulty = db.Column(db.String(50), default='intermediate')
+    difficulty = db.Column(Difficulty, default='intermediate')
     
     # Source information
     source_type = db.Column(db.String(50))  # 'uploaded_file', 'topic_generation', 'manual'
@@ -63,21 +223,35 @@ class Flashcard(db.Model):
     times_reviewed = db.Column(db.Integer, default=0)
     times_correct = db.Column(db.Integer, default=0)
     last_reviewed = db.Column(db.DateTime)
-    mastery_level = db.Column(db.Float, default=0.0)  # 0.0 to 1.0
+    # 0.0 to 1.0: accuracy * (times_reviewed / 10), capped at 1.0, reduces to times_correct / 10
+    mastery_level = db.Column(db.Float, db.Computed(
+        'CASE WHEN COALESCE(times_correct, 0) >= 10 THEN 1.0 ELSE COALESCE(times_correct, 0) / 10.0 END',
+        persisted=True
+    ))
     
     # Generation metadata
     ai_confidence = db.Column(db.Float)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=datetime.utcnow)
+    
+    # Serves get_user_flashcards' filter + keyset sort and its topic substring search (trigram GIN on
+    # Postgres); the partial index covers the never-reviewed queue
+    __table_args__ = (
+        db.Index('ix_fc_user_created', user_id, created_at.desc(), id.desc()),
+        db.Index('ix_fc_topic_trgm', topic, postgresql_using='gin', postgresql_ops={'topic': 'gin_trgm_ops'}),
+        db.Index('ix_fc_unreviewed', user_id,
+                 postgresql_where=last_reviewed.is_(None), sqlite_where=last_reviewed.is_(None)),
+    )
 
 class Quiz(db.Model):
     __tablename__ = 'quizzes'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user = db.relationship('User', back_populates='quizzes')
     title = db.Column(db.String(255), nullable=False)
     topic = db.Column(db.String(255))
-    difficulty = db.Column(db.String(50), default='mixed')
+    difficulty = db.Column(Difficulty, default='mixed')
     
     # Quiz metadata
     total_questions = db.Column(db.Integer, default=0)
@@ -88,69 +262,88 @@ class Quiz(db.Model):
     source_type = db.Column(db.String(50))
     source_content = db.Column(db.Text)
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     
     # Relationships
-    questions = db.relationship('QuizQuestion', backref='quiz', lazy=True, cascade='all, delete-orphan')
-    attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True, cascade='all, delete-orphan')
+    questions = db.relationship('QuizQuestion', back_populates='quiz', lazy='select', cascade='all, delete-orphan')
+    attempts = db.relationship('QuizAttempt', back_populates='quiz', lazy='select', cascade='all, delete-orphan')
+    
+    # Serves get_user_quizzes' filter + keyset sort and its topic substring search
+    __table_args__ = (
+        db.Index('ix_quiz_user_created', user_id, created_at.desc(), id.desc()),
+        db.Index('ix_quiz_topic_trgm', topic, postgresql_using='gin', postgresql_ops={'topic': 'gin_trgm_ops'}),
+    )
+
+# The trigram indexes need pg_trgm; other dialects get plain topic indexes
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
 
 class QuizQuestion(db.Model):
     __tablename__ = 'quiz_questions'
     
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    quiz = db.relationship('Quiz', back_populates='questions')
     question = db.Column(db.Text, nullable=False)
-    question_type = db.Column(db.String(50), nullable=False)  # multiple_choice, true_false, short_answer, fill_blank
+    question_type = db.Column(QuestionType, nullable=False)  # multiple_choice, true_false, short_answer, fill_blank
     
     # Question data (stored as JSON)
-    options = db.Column(db.Text)  # JSON array for multiple choice options
+    options = db.Column(JSONColumn)  # JSON array for multiple choice options
     correct_answer = db.Column(db.Text, nullable=False)
     explanation = db.Column(db.Text)
     
     # Metadata
-    difficulty = db.Column(db.String(50), default='intermediate')
+    difficulty = db.Column(Difficulty, default='intermediate')
     points = db.Column(db.Integer, default=1)
     ai_confidence = db.Column(db.Float)
     
     def get_options(self):
         """Get options as Python list"""
-        return json.loads(self.options) if self.options else []
+        return self.options or []
     
     def set_options(self, options_list):
         """Set options from Python list"""
-        self.options = json.dumps(options_list)
+        self.options = options_list
 
 class QuizAttempt(db.Model):
     __tablename__ = 'quiz_attempts'
     
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    quiz = db.relationship('Quiz', back_populates='attempts')
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Attempt data
-    answers = db.Column(db.Text)  # JSON of question_id: answer pairs
+    answers = db.Column(PackedDict)  # question_id: answer pairs, read and written whole
     score = db.Column(db.Float)
     percentage = db.Column(db.Float)
     time_taken = db.Column(db.Integer)  # in seconds
     
     # Timestamps
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, server_default=utcnow())
     completed_at = db.Column(db.DateTime)
     
+    # Partial index over in-progress attempts only
+    __table_args__ = (
+        db.Index('ix_qa_active', user_id,
+                 postgresql_where=completed_at.is_(None), sqlite_where=completed_at.is_(None)),
+    )
+    
     def get_answers(self):
         """Get answers as Python dict"""
-        return json.loads(self.answers) if self.answers else {}
+        return self.answers or {}
     
     def set_answers(self, answers_dict):
         """Set answers from Python dict"""
-        self.answers = json.dumps(answers_dict)
+        self.answers = answers_dict
 
 class StudySession(db.Model):
     __tablename__ = 'study_sessions'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    session_type = db.Column(db.String(50), nullable=False)  # 'flashcards', 'quiz', 'chat', 'practice'
+    user = db.relationship('User', back_populates='study_sessions')
+    session_type = db.Column(SessionType, nullable=False)  # 'flashcards', 'quiz', 'chat', 'practice'
     topic = db.Column(db.String(255))
     
     # Session data
@@ -160,10 +353,10 @@ class StudySession(db.Model):
     
     # Performance metrics
     accuracy = db.Column(db.Float)  # percentage
-    difficulty_level = db.Column(db.String(50))
+    difficulty_level = db.Column(Difficulty)
     
     # Session metadata
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, server_default=utcnow())
     ended_at = db.Column(db.DateTime)
     
 class UploadedFile(db.Model):
@@ -188,7 +381,7 @@ class UploadedFile(db.Model):
     flashcards_generated = db.Column(db.Integer, default=0)
     quiz_questions_generated = db.Column(db.Integer, default=0)
     
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, server_default=utcnow())
     processed_at = db.Column(db.DateTime)
 
 class UserProgress(db.Model):
@@ -202,7 +395,10 @@ class UserProgress(db.Model):
     total_study_time = db.Column(db.Integer, default=0)  # in seconds
     flashcards_reviewed = db.Column(db.Integer, default=0)
     quizzes_completed = db.Column(db.Integer, default=0)
-    average_score = db.Column(db.Float, default=0.0)
+    
+    # Scores are accumulated so the average is exact and updates are plain increments
+    score_sum = db.Column(db.Float, default=0.0)
+    score_count = db.Column(db.Integer, default=0)
     
     # Mastery tracking
     mastery_level = db.Column(db.Float, default=0.0)  # 0.0 to 1.0
@@ -210,13 +406,44 @@ class UserProgress(db.Model):
     last_studied = db.Column(db.DateTime)
     
     # Timestamps
-    first_studied = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    first_studied = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=datetime.utcnow)
     
     # Unique constraint
     __table_args__ = (db.UniqueConstraint('user_id', 'topic'),)
+    
+    @hybrid_property
+    def average_score(self):
+        """Mean of all recorded scores (0.0 before the first one)"""
+        return self.score_sum / self.score_count if self.score_count else 0.0
+    
+    @average_score.expression
+    def average_score(cls):
+        return case((cls.score_count > 0, cls.score_sum / cls.score_count), else_=0.0)
+
+# Per-request memoization of the read helpers below
+def _request_cached(fn):
+    """Serve repeat calls with the same arguments within one request from flask.g"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return fn(*args, **kwargs)
+        
+        cache = g.setdefault('query_cache', {})
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = fn(*args, **kwargs)
+        return list(cache[key])
+    return wrapper
+
+def _invalidate_request_cache(*fn_names):
+    """Drop this request's cached results of the named helpers after a write"""
+    if has_request_context() and 'query_cache' in g:
+        g.query_cache = {key: value for key, value in g.query_cache.items() if key[0] not in fn_names}
 
 # Helper functions for database operations
+# create_conversation, add_message and save_study_session only flush; the app
+# commits once per request, so call db.session.commit() when using them elsewhere.
 def create_conversation(user_id, title="New Conversation"):
     """Create a new conversation"""
     conversation = Conversation(
@@ -224,7 +451,8 @@ def create_conversation(user_id, title="New Conversation"):
         title=title
     )
     db.session.add(conversation)
-    db.session.commit()
+    db.session.flush()
+    _invalidate_request_cache('get_user_conversations')
     return conversation
 
 def add_message(conversation_id, content, is_user, **kwargs):
@@ -236,124 +464,197 @@ def add_message(conversation_id, content, is_user, **kwargs):
         **kwargs
     )
     db.session.add(message)
-    db.session.commit()
+    db.session.flush()
+    _invalidate_request_cache('get_user_conversations', 'get_conversation_messages')
     return message
 
+def _bulk_insert(model, rows):
+    """Insert rows (dicts of column values) in batched statements and return the new objects"""
+    if not rows:
+        return []
+    
+    if db.engine.dialect.insert_executemany_returning:
+        # One multi-row INSERT ... RETURNING per batch instead of the unit of work per object;
+        # callers rely on getting the objects back in the order of rows
+        return db.session.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows).all()
+    
+    # Dialects without RETURNING (MySQL) need per-row inserts to learn the new ids
+    objects = [model(**row) for row in rows]
+    db.session.add_all(objects)
+    db.session.flush()
+    return objects
+
 def save_flashcards(user_id, flashcards, source_type="ai_generated", source_content=""):
     """Save generated flashcards to database"""
-    saved_flashcards = []
-    
-    for flashcard_data in flashcards:
-        if isinstance(flashcard_data, dict) and 'question' in flashcard_data:
-            flashcard = Flashcard(
-                user_id=user_id,
-                question=flashcard_data['question'],
-                answer=flashcard_data['answer'],
-                topic=flashcard_data.get('topic', ''),
-                difficulty=flashcard_data.get('difficulty', 'intermediate'),
-                source_type=source_type,
-                source_content=source_content[:1000],  # Limit length
-                ai_confidence=flashcard_data.get('confidence', 0.7)
-            )
-            db.session.add(flashcard)
-            saved_flashcards.append(flashcard)
-    
+    source_content = source_content[:1000]  # Limit length
+    rows = [
+        {
+            'user_id': user_id,
+            'question': flashcard_data['question'],
+            'answer': flashcard_data['answer'],
+            'topic': flashcard_data.get('topic', ''),
+            'difficulty': normalize_difficulty(flashcard_data.get('difficulty')),
+            'source_type': source_type,
+            'source_content': source_content,
+            'ai_confidence': flashcard_data.get('confidence', 0.7)
+        }
+        for flashcard_data in flashcards
+        if isinstance(flashcard_data, dict) and 'question' in flashcard_data
+    ]
+    
+    saved_flashcards = _bulk_insert(Flashcard, rows)
     db.session.commit()
+    _invalidate_request_cache('get_user_flashcards')
     return saved_flashcards
 
 def save_quiz(user_id, quiz_data, questions):
-    """Save generated quiz to database"""
-    quiz = Quiz(
-        user_id=user_id,
-        title=quiz_data.get('title', f"Quiz - {datetime.now().strftime('%Y-%m-%d')}"),
-        topic=quiz_data.get('topic', ''),
-        difficulty=quiz_data.get('difficulty', 'mixed'),
-        total_questions=len(questions),
-        source_type=quiz_data.get('source_type', 'ai_generated'),
-        source_content=quiz_data.get('source_content', '')[:1000]
-    )
-    db.session.add(quiz)
-    db.session.flush()  # Get the quiz ID
+    """Save generated quiz to database: one INSERT ... RETURNING for the quiz, one batched insert for its questions"""
+    quiz, = _bulk_insert(Quiz, [{
+        'user_id': user_id,
+        'title': quiz_data.get('title', f"Quiz - {datetime.now().strftime('%Y-%m-%d')}"),
+        'topic': quiz_data.get('topic', ''),
+        'difficulty': normalize_difficulty(quiz_data.get('difficulty'), 'mixed'),
+        'total_questions': len(questions),
+        'source_type': quiz_data.get('source_type', 'ai_generated'),
+        'source_content': quiz_data.get('source_content', '')[:1000]
+    }])
     
     # Save questions
-    for q_data in questions:
-        if isinstance(q_data, dict) and 'question' in q_data:
-            question = QuizQuestion(
-                quiz_id=quiz.id,
-                question=q_data['question'],
-                question_type=q_data.get('type', 'short_answer'),
-                correct_answer=str(q_data.get('answer', q_data.get('correct_answer', ''))),
-                explanation=q_data.get('explanation', ''),
-                difficulty=q_data.get('difficulty', 'intermediate'),
-                ai_confidence=q_data.get('confidence', 0.7)
-            )
-            
-            # Handle multiple choice options
-            if q_data.get('options'):
-                question.set_options(q_data['options'])
-            
-            db.session.add(question)
+    rows = [
+        {
+            'quiz_id': quiz.id,
+            'question': q_data['question'],
+            'question_type': normalize_question_type(q_data.get('type')),
+            'correct_answer': str(q_data.get('answer', q_data.get('correct_answer', ''))),
+            'explanation': q_data.get('explanation', ''),
+            'difficulty': normalize_difficulty(q_data.get('difficulty')),
+            'ai_confidence': q_data.get('confidence', 0.7),
+            # Multiple choice options are stored as JSON
+            'options': q_data['options'] if q_data.get('options') else None
+        }
+        for q_data in questions
+        if isinstance(q_data, dict) and 'question' in q_data
+    ]
+    
+    if rows:
+        db.session.execute(insert(QuizQuestion), rows)
     
     db.session.commit()
+    _invalidate_request_cache('get_user_quizzes')
     return quiz
 
+@_request_cached
 def get_user_conversations(user_id, limit=20):
-    """Get user's conversation history"""
+    """Get user's conversation history (messages load on access; see get_conversation_summaries)"""
     return Conversation.query.filter_by(user_id=user_id)\
         .order_by(Conversation.updated_at.desc())\
         .limit(limit).all()
 
+def get_conversation_summaries(conversation_ids):
+    """
+    Message count and last message content per conversation, in one query
+    
+    Returns {conversation_id: (message_count, last_content)}; conversations
+    without messages are absent. Only the last message's content is read,
+    instead of loading every conversation's full history for a list view.
+    """
+    if not conversation_ids:
+        return {}
+    
+    in_list = Message.conversation_id.in_(conversation_ids)
+    counts = select(Message.conversation_id, func.count().label('message_count'))\
+        .where(in_list).group_by(Message.conversation_id).subquery()
+    ranked = select(
+        Message.conversation_id,
+        Message.content,
+        func.row_number().over(
+            partition_by=Message.conversation_id,
+            order_by=(Message.timestamp.desc(), Message.id.desc())
+        ).label('position')
+    ).where(in_list).subquery()
+    
+    rows = db.session.execute(
+        select(counts.c.conversation_id, counts.c.message_count, ranked.c.content)
+        .join(ranked, and_(ranked.c.conversation_id == counts.c.conversation_id, ranked.c.position == 1))
+    )
+    return {conversation_id: (count, content) for conversation_id, count, content in rows}
+
+@_request_cached
 def get_conversation_messages(conversation_id):
     """Get all messages in a conversation"""
     return Message.query.filter_by(conversation_id=conversation_id)\
         .order_by(Message.timestamp.asc()).all()
 
-def get_user_flashcards(user_id, topic=None, limit=50):
-    """Get user's flashcards, optionally filtered by topic"""
-    query = Flashcard.query.filter_by(user_id=user_id)
+def _keyset_page(query, model, cursor, limit):
+    """Newest-first page of query starting after cursor, a (created_at, id) pair from page_cursor()"""
+    if cursor:
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(*cursor))
+    
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    return query.limit(limit).all() if limit else query.all()
+
+def page_cursor(rows, limit):
+    """Cursor for the page after rows, or None when rows was the last page"""
+    if not rows or not limit or len(rows) < limit:
+        return None
+    return (rows[-1].created_at, rows[-1].id)
+
+@_request_cached
+def get_user_flashcards(user_id, topic=None, limit=50, cursor=None):
+    """Get user's flashcards, optionally filtered by topic (source_content loads on access)"""
+    query = Flashcard.query.filter_by(user_id=user_id).options(defer(Flashcard.source_content))
     
     if topic:
         query = query.filter(Flashcard.topic.ilike(f'%{topic}%'))
     
-    return query.order_by(Flashcard.created_at.desc()).limit(limit).all()
+    return _keyset_page(query, Flashcard, cursor, limit)
 
-def get_user_quizzes(user_id, topic=None):
-    """Get user's quizzes"""
-    query = Quiz.query.filter_by(user_id=user_id)
+@_request_cached
+def get_user_quizzes(user_id, topic=None, limit=None, cursor=None):
+    """Get user's quizzes, with their questions loaded in one extra query (source_content loads on access)"""
+    query = Quiz.query.filter_by(user_id=user_id)\
+        .options(defer(Quiz.source_content), selectinload(Quiz.questions))
     
     if topic:
         query = query.filter(Quiz.topic.ilike(f'%{topic}%'))
     
-    return query.order_by(Quiz.created_at.desc()).all()
+    return _keyset_page(query, Quiz, cursor, limit)
 
 def update_flashcard_performance(flashcard_id, correct):
-    """Update flashcard performance metrics"""
-    flashcard = Flashcard.query.get(flashcard_id)
-    if flashcard:
-        flashcard.times_reviewed += 1
-        if correct:
-            flashcard.times_correct += 1
-        
-        # Calculate mastery level
-        if flashcard.times_reviewed > 0:
-            accuracy = flashcard.times_correct / flashcard.times_reviewed
-            flashcard.mastery_level = min(1.0, accuracy * (flashcard.times_reviewed / 10))
-        
-        flashcard.last_reviewed = datetime.utcnow()
-        db.session.commit()
+    """
+    Update flashcard performance metrics
+    
+    One UPDATE with the arithmetic done in SQL, so concurrent reviews of
+    the same card cannot lose each other's increments; mastery_level is a
+    generated column the database recomputes from times_correct.
+    """
+    result = db.session.execute(
+        update(Flashcard)
+        .where(Flashcard.id == flashcard_id)
+        .values(
+            times_reviewed=Flashcard.times_reviewed + 1,
+            times_correct=Flashcard.times_correct + (1 if correct else 0),
+            last_reviewed=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    _invalidate_request_cache('get_user_flashcards')
     
-    return flashcard
+    if not result.rowcount:
+        return None
+    return db.session.get(Flashcard, flashcard_id)
 
 def save_study_session(user_id, session_data):
     """Save study session data"""
     session = StudySession(
         user_id=user_id,
-        session_type=session_data.get('type', 'general'),
+        session_type=normalize_session_type(session_data.get('type')),
         topic=session_data.get('topic', ''),
         items_studied=session_data.get('items_studied', 0),
         correct_answers=session_data.get('correct_answers', 0),
         time_spent=session_data.get('time_spent', 0),
-        difficulty_level=session_data.get('difficulty', 'mixed'),
+        difficulty_level=normalize_difficulty(session_data.get('difficulty'), 'mixed'),
         ended_at=datetime.utcnow()
     )
     
@@ -362,45 +663,124 @@ def save_study_session(user_id, session_data):
         session.accuracy = (session.correct_answers / session.items_studied) * 100
     
     db.session.add(session)
-    db.session.commit()
+    db.session.flush()
     return session
 
 def update_user_progress(user_id, topic, study_data):
-    """Update or create user progress for a topic"""
-    progress = UserProgress.query.filter_by(user_id=user_id, topic=topic).first()
-    
-    if not progress:
-        progress = UserProgress(
-            user_id=user_id,
-            topic=topic,
-            first_studied=datetime.utcnow()
-        )
-        db.session.add(progress)
-    
-    # Update metrics
-    progress.total_study_time += study_data.get('time_spent', 0)
-    progress.flashcards_reviewed += study_data.get('flashcards_reviewed', 0)
-    progress.quizzes_completed += study_data.get('quizzes_completed', 0)
-    
-    # Update average score
-    if study_data.get('score'):
-        if progress.average_score == 0:
-            progress.average_score = study_data['score']
-        else:
-            # Running average
-            progress.average_score = (progress.average_score + study_data['score']) / 2
-    
-    # Update streak
-    if progress.last_studied:
-        days_since = (datetime.utcnow() - progress.last_studied).days
-        if days_since == 1:
-            progress.streak_days += 1
-        elif days_since > 1:
-            progress.streak_days = 1
-    else:
-        progress.streak_days = 1
-    
-    progress.last_studied = datetime.utcnow()
+    """
+    Update or create user progress for a topic
+    
+    The counters, score totals and streak are updated by one UPDATE with
+    SQL-side increments, so concurrent calls cannot lose each other's
+    writes; the row is only inserted when it does not exist yet.
+    """
+    now = datetime.utcnow()
+    score = study_data.get('score')
+    
+    values = {
+        UserProgress.total_study_time: UserProgress.total_study_time + study_data.get('time_spent', 0),
+        UserProgress.flashcards_reviewed: UserProgress.flashcards_reviewed + study_data.get('flashcards_reviewed', 0),
+        UserProgress.quizzes_completed: UserProgress.quizzes_completed + study_data.get('quizzes_completed', 0),
+        # Streak: +1 when last studied 1 day ago, reset after a longer gap, unchanged the same day
+        UserProgress.streak_days: case(
+            (UserProgress.last_studied.is_(None), 1),
+            (UserProgress.last_studied <= now - timedelta(days=2), 1),
+            (UserProgress.last_studied <= now - timedelta(days=1), UserProgress.streak_days + 1),
+            else_=UserProgress.streak_days
+        ),
+        UserProgress.last_studied: now
+    }
+    if score is not None:
+        values[UserProgress.score_sum] = UserProgress.score_sum + score
+        values[UserProgress.score_count] = UserProgress.score_count + 1
+    
+    def apply_update():
+        return UserProgress.query.filter_by(user_id=user_id, topic=topic)\
+            .update(values, synchronize_session=False)
+    
+    if not apply_update():
+        try:
+            with db.session.begin_nested():
+                db.session.add(UserProgress(
+                    user_id=user_id,
+                    topic=topic,
+                    total_study_time=study_data.get('time_spent', 0),
+                    flashcards_reviewed=study_data.get('flashcards_reviewed', 0),
+                    quizzes_completed=study_data.get('quizzes_completed', 0),
+                    score_sum=score or 0.0,
+                    score_count=0 if score is None else 1,
+                    streak_days=1,
+                    first_studied=now,
+                    last_studied=now
+                ))
+        except IntegrityError:
+            # Another request created the row first; add to it instead
+            apply_update()
+    
     db.session.commit()
     
-    return progress
\ No newline at end of file
+    return UserProgress.query.filter_by(user_id=user_id, topic=topic).first()
+
+# Enum columns as (table, column, type, fallback for unknown values, nullable)
+_ENUM_COLUMNS = (
+    ('flashcards', 'difficulty', Difficulty, 'intermediate', True),
+    ('quizzes', 'difficulty', Difficulty, 'mixed', True),
+    ('quiz_questions', 'question_type', QuestionType, 'short_answer', False),
+    ('quiz_questions', 'difficulty', Difficulty, 'intermediate', True),
+    ('study_sessions', 'session_type', SessionType, 'general', False),
+    ('study_sessions', 'difficulty_level', Difficulty, 'mixed', True),
+)
+
+def _sql_values(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+def enum_migration_sql(dialect_name):
+    """
+    Statements upgrading a database created while these columns were VARCHAR(50)
+    and users.email / conversations.title were VARCHAR(255)
+    
+    Legacy values are first mapped through the same aliases as the save
+    helpers (anything else becomes the column's fallback), so the ALTERs
+    cannot fail on existing rows. SQLite stores enums as plain VARCHAR and
+    only needs the data fix-ups.
+    """
+    aliases = {Difficulty.name: _DIFFICULTY_ALIASES, QuestionType.name: _QUESTION_TYPE_ALIASES,
+               SessionType.name: _SESSION_TYPE_ALIASES}
+    statements = []
+    
+    for table, column, enum_type, fallback, _ in _ENUM_COLUMNS:
+        mapping = {value: value for value in enum_type.enums}
+        mapping.update(aliases[enum_type.name])
+        whens = ' '.join(f"WHEN '{old}' THEN '{new}'" for old, new in mapping.items())
+        statements.append(
+            f"UPDATE {table} SET {column} = CASE LOWER({column}) {whens} ELSE '{fallback}' END "
+            f"WHERE {column} NOT IN ({_sql_values(enum_type.enums)})"
+        )
+    statements.append("UPDATE conversations SET title = SUBSTR(title, 1, 120) WHERE LENGTH(title) > 120")
+    
+    if dialect_name == 'postgresql':
+        for enum_type in (Difficulty, QuestionType, SessionType):
+            statements.append(f"CREATE TYPE {enum_type.name} AS ENUM ({_sql_values(enum_type.enums)})")
+        for table, column, enum_type, _, _ in _ENUM_COLUMNS:
+            statements.append(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {enum_type.name} "
+                f"USING {column}::{enum_type.name}"
+            )
+        statements.append("ALTER TABLE users ALTER COLUMN email TYPE VARCHAR(320)")
+        statements.append("ALTER TABLE conversations ALTER COLUMN title TYPE VARCHAR(120)")
+    elif dialect_name in ('mysql', 'mariadb'):
+        for table, column, enum_type, _, nullable in _ENUM_COLUMNS:
+            statements.append(
+                f"ALTER TABLE {table} MODIFY {column} ENUM({_sql_values(enum_type.enums)}) "
+                f"{'NULL' if nullable else 'NOT NULL'}"
+            )
+        statements.append("ALTER TABLE users MODIFY email VARCHAR(320) NOT NULL")
+        statements.append("ALTER TABLE conversations MODIFY title VARCHAR(120)")
+    
+    return statements
+
+def migrate_enum_columns():
+    """Apply enum_migration_sql() to the app's database (run once, e.g. from `flask shell`)"""
+    for statement in enum_migration_sql(db.engine.dialect.name):
+        db.session.execute(text(statement))
+    db.session.commit()
@@ -0,0 +1,26 @@
+# BrainyPal utility tests
+# test_utils.py
+
+import random
+
+import pytest
+
+import utils
+
+
+@pytest.mark.jit
+@pytest.mark.skipif(not utils.HAS_NUMBA, reason="numba is not installed")
+def test_word_stats_jit_matches_python():
+    """The compiled word scan agrees with the pure-Python _word_stats fallback"""
+    rng = random.Random(0)
+    pieces = ['the', 'photosynthesis', 'queue', "don't", 'rhythm', 'able', 'e',
+              "'", ' ', '\n', '.', '42', 'é', 'naïve', 'Électricité', 'ARE']
+
+    samples = ['', ' ', 'a', "'tis", 'make', 'beautiful']
+    samples += [''.join(rng.choice(pieces) + rng.choice(['', ' ']) for _ in range(rng.randint(1, 60)))
+                for _ in range(500)]
+
+    for sample in samples:
+        text = sample.lower()
+        buf = utils.np.frombuffer(text.encode('ascii', 'replace'), dtype=utils.np.uint8)
+        assert tuple(utils._word_stats_jit(buf)) == utils._word_stats(text), sample
@@ -1,15 +1,25 @@
-def preprocess_study_content(content: str) -> Dict[str, Any]:
-    # BrainyPal Utility Functions
+# BrainyPal Utility Functions
 # utils.py
 
+import atexit
+import multiprocessing
 import os
 import re
 import logging
-import hashlib
+import threading
+import time
+import functools
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import json
+import secrets
+import subprocess
 from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from werkzeug.security import generate_password_hash, check_password_hash
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Deque
 
 # Try to import optional dependencies
 try:
@@ -19,6 +29,27 @@ except ImportError:
     HAS_PDF_SUPPORT = False
     PyPDF2 = None
 
+try:
+    import docx2txt
+    HAS_DOC_SUPPORT = True
+except ImportError:
+    HAS_DOC_SUPPORT = False
+    docx2txt = None
+
+try:
+    from dotenv import load_dotenv
+    HAS_DOTENV = True
+except ImportError:
+    HAS_DOTENV = False
+    load_dotenv = None
+
+try:
+    import fitz  # PyMuPDF
+    HAS_MUPDF = True
+except ImportError:
+    HAS_MUPDF = False
+    fitz = None
+
 try:
     import docx
     HAS_DOCX_SUPPORT = True
@@ -26,10 +57,31 @@ except ImportError:
     HAS_DOCX_SUPPORT = False
     docx = None
 
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+    ahocorasick = None
+
+try:
+    import numpy as np
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    np = None
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None
+
 try:
     import nltk
-    from nltk.tokenize import sent_tokenize, word_tokenize
-    from nltk.corpus import stopwords
+    from nltk.tokenize import NLTKWordTokenizer
     HAS_NLTK = True
 except ImportError:
     HAS_NLTK = False
@@ -38,31 +90,73 @@ except ImportError:
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def _log_dumps(obj: Any) -> str:
+    """Serialize a structured log payload, with orjson when it is installed"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+# NLTK tokenizers, built once: word_tokenize/sent_tokenize re-resolve the punkt
+# resource and rebuild the sentence splitter on every call
+_WORD_TOKENIZER = NLTKWordTokenizer() if HAS_NLTK else None
+_sentence_tokenizer = None
+_punkt_checked = False
+
+def _ensure_punkt() -> None:
+    """Download the punkt models on first use if they are missing"""
+    global _punkt_checked
+    if _punkt_checked or not HAS_NLTK:
+        return
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        try:
+            nltk.download('punkt', quiet=True)
+        except Exception:
+            pass  # Ignore if download fails
+    _punkt_checked = True
+
+def _sent_tokenize(text: str) -> List[str]:
+    """Same as nltk.sent_tokenize(text) with the English punkt model loaded once"""
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        _ensure_punkt()
+        _sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+    return _sentence_tokenizer.tokenize(text)
+
+# Word counts and lengths only need letters, not Penn Treebank punctuation tokens
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z']*")
+
+def _fast_words(text: str) -> List[str]:
+    """Words of text for statistics (counts, lengths, lookups)"""
+    return _WORD_RE.findall(text)
+
 # File handling utilities
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'doc', 'docx', 'md', 'rtf'}
+ALLOWED_EXTENSIONS = frozenset({'txt', 'pdf', 'doc', 'docx', 'md', 'rtf'})
+
+_FILE_TYPES = {
+    'pdf': 'pdf',
+    'doc': 'word',
+    'docx': 'word',
+    'txt': 'text',
+    'md': 'markdown',
+    'rtf': 'rtf'
+}
+
+def _file_extension(filename: str) -> str:
+    """Lower-case extension without the dot ('' when there is none)"""
+    return os.path.splitext(filename)[1][1:].lower()
 
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return _file_extension(filename) in ALLOWED_EXTENSIONS
 
 def get_file_type(filename: str) -> str:
     """Get file type from filename"""
     if not filename:
         return 'unknown'
     
-    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-    
-    file_types = {
-        'pdf': 'pdf',
-        'doc': 'word',
-        'docx': 'word',
-        'txt': 'text',
-        'md': 'markdown',
-        'rtf': 'rtf'
-    }
-    
-    return file_types.get(extension, 'unknown')
+    return _FILE_TYPES.get(_file_extension(filename), 'unknown')
 
 def generate_secure_filename(original_filename: str) -> str:
     """Generate secure filename with timestamp"""
@@ -79,11 +173,35 @@ def get_file_size_mb(filepath: str) -> float:
     except Exception:
         return 0.0
 
+# Read buffer for uploaded files, so parsers doing many small reads hit memory, not the OS
+FILE_READ_BUFFER = 1 << 20
+
+# Leading bytes of the binary formats we extract from
+_FILE_SIGNATURES = (
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'word'),          # .docx (zip container)
+    (b'\xd0\xcf\x11\xe0', 'word'),   # .doc (OLE compound file)
+)
+
+def sniff_file_type(filepath: str) -> str:
+    """Get file type from the file's leading bytes, falling back to its extension"""
+    try:
+        with open(filepath, 'rb') as file:
+            head = file.read(8)
+    except OSError:
+        head = b''
+    
+    for signature, file_type in _FILE_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    
+    return get_file_type(filepath)
+
 # File processing functions
 def process_uploaded_file(filepath: str) -> str:
     """Process uploaded file and extract text content"""
     try:
-        file_type = get_file_type(filepath)
+        file_type = sniff_file_type(filepath)
         
         if file_type == 'pdf':
             return extract_text_from_pdf(filepath)
@@ -98,18 +216,77 @@ def process_uploaded_file(filepath: str) -> str:
         logger.error(f"File processing error for {filepath}: {e}")
         raise e
 
+# Below this many pages, process start-up costs more than MuPDF spends on the whole document
+PDF_PARALLEL_MIN_PAGES = 16
+
+def _extract_pdf_page_range(args) -> List[str]:
+    """Text of pages [start, stop) of a PDF (process pool worker, opens the file once)"""
+    filepath, start, stop = args
+    with fitz.open(filepath) as doc:
+        return [doc[page_number].get_text("text") for page_number in range(start, stop)]
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every PDF extraction, started on first use
+    
+    Workers come from a forkserver (spawn where that is unavailable), so they
+    never inherit the threads or held locks of the WSGI process as fork would.
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pdf_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                mp_context=multiprocessing.get_context(method))
+            atexit.register(_pdf_executor.shutdown)
+        return _pdf_executor
+
+def _extract_pdf_pages_parallel(filepath: str, page_count: int) -> List[str]:
+    """Page texts of a PDF, split into one contiguous page range per CPU"""
+    global _pdf_executor
+    workers = min(os.cpu_count() or 1, page_count)
+    step = -(-page_count // workers)
+    ranges = [(filepath, start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    
+    executor = _get_pdf_executor()
+    try:
+        return [text for chunk in executor.map(_extract_pdf_page_range, ranges) for text in chunk]
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool for the next upload
+        with _pdf_executor_lock:
+            if _pdf_executor is executor:
+                _pdf_executor = None
+        raise
+
 def extract_text_from_pdf(filepath: str) -> str:
-    """Extract text from PDF file"""
-    if not HAS_PDF_SUPPORT:
-        raise ValueError("PDF support not available. Install PyPDF2: pip install PyPDF2")
+    """Extract text from PDF file (PyMuPDF when installed, else PyPDF2)"""
+    if not HAS_MUPDF and not HAS_PDF_SUPPORT:
+        raise ValueError("PDF support not available. Install PyMuPDF: pip install PyMuPDF")
     
     try:
-        text = ""
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
+        if HAS_MUPDF:
+            with fitz.open(filepath) as doc:
+                page_count = doc.page_count
+                if page_count < PDF_PARALLEL_MIN_PAGES or (os.cpu_count() or 1) < 2:
+                    pages = [page.get_text("text") for page in doc]
+                else:
+                    pages = None
             
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if pages is None:
+                pages = _extract_pdf_pages_parallel(filepath, page_count)
+            text = "\n".join(pages)
+        else:
+            parts = []
+            with open(filepath, 'rb', buffering=FILE_READ_BUFFER) as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                
+                for page in pdf_reader.pages:
+                    parts.append(page.extract_text())
+                    parts.append("\n")
+            text = "".join(parts)
         
         # Clean extracted text
         text = clean_extracted_text(text)
@@ -129,27 +306,32 @@ def extract_text_from_word(filepath: str) -> str:
         raise ValueError("Word document support not available. Install python-docx: pip install python-docx")
     
     try:
-        if filepath.endswith('.docx'):
+        with open(filepath, 'rb') as file:
+            is_docx = file.read(4) == b'PK\x03\x04'
+        
+        if is_docx:
             doc = docx.Document(filepath)
-            text = ""
+            parts = []
             
             for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+                parts.append(paragraph.text)
+                parts.append("\n")
             
             # Extract text from tables
             for table in doc.tables:
                 for row in table.rows:
                     for cell in row.cells:
-                        text += cell.text + " "
-                    text += "\n"
+                        parts.append(cell.text)
+                        parts.append(" ")
+                    parts.append("\n")
+            
+            text = "".join(parts)
         
         else:
             # Handle .doc files (older format)
-            try:
-                import docx2txt
-                text = docx2txt.process(filepath)
-            except ImportError:
+            if not HAS_DOC_SUPPORT:
                 raise ValueError("Cannot process .doc files. Please convert to .docx format or install docx2txt.")
+            text = docx2txt.process(filepath)
         
         # Clean extracted text
         text = clean_extracted_text(text)
@@ -170,10 +352,13 @@ def extract_text_from_text_file(filepath: str) -> str:
     try:
         encodings = ['utf-8', 'utf-16', 'latin1', 'cp1252']
         
+        # Read once; each encoding attempt only decodes the bytes again
+        with open(filepath, 'rb', buffering=FILE_READ_BUFFER) as file:
+            data = file.read()
+        
         for encoding in encodings:
             try:
-                with open(filepath, 'r', encoding=encoding) as file:
-                    text = file.read()
+                text = data.decode(encoding)
                 
                 # Clean and validate text
                 text = clean_extracted_text(text)
@@ -190,77 +375,66 @@ def extract_text_from_text_file(filepath: str) -> str:
         logger.error(f"Text file extraction failed: {e}")
         raise ValueError(f"Failed to extract text from file: {str(e)}")
 
+# ASCII control characters that survive whitespace collapsing (\x00-\x08, \x0e-\x1b, \x7f)
+_ASCII_CONTROL_TABLE = str.maketrans('', '', ''.join(chr(c) for c in (*range(0x20), 0x7F) if not chr(c).isspace()))
+
 def clean_extracted_text(text: str) -> str:
     """Clean and normalize extracted text"""
     if not text:
         return ""
     
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove non-printable characters except newlines and tabs
-    text = re.sub(r'[^\x20-\x7E\n\t]', '', text)
+    # Collapse every whitespace run (newlines and tabs included) to a single space
+    text = ' '.join(text.split())
     
-    # Remove multiple consecutive newlines
-    text = re.sub(r'\n\s*\n', '\n\n', text)
+    # Keep printable ASCII only: drop non-ASCII in C, then the remaining control characters
+    text = text.encode('ascii', 'ignore').decode('ascii').translate(_ASCII_CONTROL_TABLE)
     
     # Remove leading/trailing whitespace
-    text = text.strip()
-    
-    return text
+    return text.strip()
 
 def validate_file_content(content: str, min_length: int = 50) -> bool:
     """Validate extracted file content"""
     if not content or len(content.strip()) < min_length:
         return False
     
-    # Check if content has enough meaningful words
-    words = word_tokenize(content.lower())
-    meaningful_words = [word for word in words if word.isalpha() and len(word) > 2]
+    # Check if content has enough meaningful words, stopping at the 20th
+    meaningful = 0
+    for match in _WORD_RE.finditer(content):
+        word = match.group()
+        if len(word) > 2 and word.isalpha():
+            meaningful += 1
+            if meaningful >= 20:
+                return True
     
-    return len(meaningful_words) >= 20
+    return False
 
 # Text processing utilities
 def preprocess_study_content(content: str) -> Dict[str, Any]:
     """Preprocess study content for AI generation"""
     try:
-        # Initialize NLTK if available
+        # Basic statistics; only counts are needed, so tokens are counted per
+        # sentence instead of being collected into one list for the document
+        sentences = None
         if HAS_NLTK:
             try:
-                nltk.data.find('tokenizers/punkt')
-            except LookupError:
-                try:
-                    nltk.download('punkt', quiet=True)
-                except:
-                    pass  # Ignore if download fails
-        
-        # Basic statistics
-        if HAS_NLTK:
-            try:
-                words = word_tokenize(content)
-                sentences = sent_tokenize(content)
-                word_count = len(words)
-                sentence_count = len(sentences)
+                sentences = _sent_tokenize(content)
+                tokenize = _WORD_TOKENIZER.tokenize
+                word_count = sum(len(tokenize(sentence)) for sentence in sentences)
             except:
-                # Fallback to simple splitting
-                words = content.split()
-                sentences = content.split('.')
-                word_count = len(words)
-                sentence_count = len(sentences)
-        else:
+                sentences = None
+        if sentences is None:
             # Simple fallback
-            words = content.split()
             sentences = content.split('.')
-            word_count = len(words)
-            sentence_count = len(sentences)
+            word_count = len(content.split())
+        sentence_count = len(sentences)
         
         char_count = len(content)
         
         # Estimate reading time (average 200 words per minute)
         reading_time = max(1, round(word_count / 200))
         
-        # Extract key information
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+        # Extract key information (non-blank paragraphs, without stripped copies)
+        paragraph_count = sum(1 for p in content.split('\n\n') if p and not p.isspace())
         
         # Find potential headers/titles
         headers = extract_headers(content)
@@ -272,11 +446,11 @@ def preprocess_study_content(content: str) -> Dict[str, Any]:
             'word_count': word_count,
             'sentence_count': sentence_count,
             'char_count': char_count,
-            'paragraph_count': len(paragraphs),
+            'paragraph_count': paragraph_count,
             'estimated_reading_time': reading_time,
             'estimated_difficulty': difficulty,
             'headers': headers,
-            'key_sentences': rank_sentences_by_importance(sentences)[:10]
+            'key_sentences': rank_sentences_by_importance(sentences, top_k=10)
         }
         
     except Exception as e:
@@ -289,21 +463,30 @@ def preprocess_study_content(content: str) -> Dict[str, Any]:
             'error': str(e)
         }
 
+# Markdown headers, numbered sections and title case lines; a line can only start
+# one of them ('#', digit, capital), so a single alternation finds all three
+_HEADERS_RE = re.compile(
+    r'^(?:#+\s+(?P<md>.+)'
+    r'|\d+\.?\s+(?P<num>[A-Z][^.\n]{10,60})'
+    r'|(?P<title>[A-Z][A-Za-z\s]{10,60}))$',
+    re.MULTILINE
+)
+
 def extract_headers(content: str) -> List[str]:
     """Extract potential headers and section titles"""
-    headers = []
-    
-    # Pattern for markdown headers
-    markdown_headers = re.findall(r'^#+\s+(.+), content, re.MULTILINE)
-    headers.extend(markdown_headers)
+    markdown_headers, numbered_sections, title_lines = [], [], []
     
-    # Pattern for numbered sections
-    numbered_sections = re.findall(r'^\d+\.?\s+([A-Z][^.\n]{10,60}), content, re.MULTILINE)
-    headers.extend(numbered_sections)
+    for match in _HEADERS_RE.finditer(content):
+        md, num, title = match.group('md', 'num', 'title')
+        if md is not None:
+            markdown_headers.append(md)
+        elif num is not None:
+            numbered_sections.append(num)
+        else:
+            title_lines.append(title)
     
-    # Pattern for title case lines
-    title_lines = re.findall(r'^([A-Z][A-Za-z\s]{10,60}), content, re.MULTILINE)
-    headers.extend(title_lines)
+    # Same precedence as before: markdown, then numbered, then title case
+    headers = markdown_headers + numbered_sections + title_lines
     
     # Remove duplicates and clean
     clean_headers = []
@@ -314,26 +497,69 @@ def extract_headers(content: str) -> List[str]:
     
     return clean_headers[:10]  # Return top 10 headers
 
+def _word_stats(text: str):
+    """(words, letters, complex words) of lowercased text, with words as in _fast_words
+    and complex meaning 7+ characters or 3+ syllables per count_syllables"""
+    words = _fast_words(text)
+    complex_words = sum(1 for word in words if len(word) >= 7 or count_syllables(word) >= 3)
+    return len(words), sum(len(word) for word in words), complex_words
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _word_stats_jit(buf):
+        """_word_stats over lowercased ASCII bytes in one compiled scan"""
+        words = 0
+        letters = 0
+        complex_words = 0
+        i = 0
+        n = len(buf)
+        
+        while i < n:
+            if not 97 <= buf[i] <= 122:
+                i += 1
+                continue
+            
+            # A word: a letter, then letters and apostrophes
+            start = i
+            syllables = 0
+            prev_was_vowel = False
+            while i < n and (97 <= buf[i] <= 122 or buf[i] == 39):
+                c = buf[i]
+                is_vowel = c == 97 or c == 101 or c == 105 or c == 111 or c == 117 or c == 121
+                if is_vowel and not prev_was_vowel:
+                    syllables += 1
+                prev_was_vowel = is_vowel
+                i += 1
+            
+            length = i - start
+            if buf[i - 1] == 101 and syllables > 1:  # silent 'e'
+                syllables -= 1
+            
+            words += 1
+            letters += length
+            if length >= 7 or syllables >= 3:
+                complex_words += 1
+        
+        return words, letters, complex_words
+
 def estimate_content_difficulty(content: str, word_count: int, sentence_count: int) -> str:
     """Estimate content difficulty level"""
     try:
         # Calculate average sentence length
         avg_sentence_length = word_count / sentence_count if sentence_count > 0 else 0
         
-        # Calculate average word length
-        if HAS_NLTK:
-            try:
-                words = word_tokenize(content.lower())
-            except:
-                words = content.lower().split()
+        # Word statistics: total, letters, complex words (3+ syllables or 7+ characters);
+        # non-ASCII characters become '?' so they still end words as in _fast_words
+        text = content.lower()
+        if HAS_NUMBA:
+            buf = np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8)
+            total_words, total_letters, complex_words = _word_stats_jit(buf)
         else:
-            words = content.lower().split()
-            
-        avg_word_length = sum(len(word) for word in words) / len(words) if words else 0
+            total_words, total_letters, complex_words = _word_stats(text)
         
-        # Count complex words (3+ syllables or 7+ characters)
-        complex_words = sum(1 for word in words if len(word) >= 7 or count_syllables(word) >= 3)
-        complex_word_ratio = complex_words / len(words) if words else 0
+        # Calculate average word length
+        avg_word_length = total_letters / total_words if total_words else 0
+        complex_word_ratio = complex_words / total_words if total_words else 0
         
         # Scoring system
         difficulty_score = 0
@@ -365,19 +591,18 @@ def estimate_content_difficulty(content: str, word_count: int, sentence_count: i
         logger.error(f"Difficulty estimation failed: {e}")
         return 'intermediate'
 
+# Byte table mapping vowels to b'1' and every other byte to b'0'
+_VOWEL_MASK_TABLE = bytes(0x31 if chr(c) in 'aeiouy' else 0x30 for c in range(256))
+
 def count_syllables(word: str) -> int:
     """Count syllables in a word (approximation)"""
     try:
         word = word.lower()
-        vowels = 'aeiouy'
-        syllable_count = 0
-        prev_was_vowel = False
         
-        for char in word:
-            is_vowel = char in vowels
-            if is_vowel and not prev_was_vowel:
-                syllable_count += 1
-            prev_was_vowel = is_vowel
+        # Each vowel group starts where a non-vowel is followed by a vowel; non-ASCII
+        # characters become '?' so they still separate groups
+        vowel_mask = word.encode('ascii', 'replace').translate(_VOWEL_MASK_TABLE)
+        syllable_count = (b'0' + vowel_mask).count(b'01')
         
         # Handle silent 'e'
         if word.endswith('e') and syllable_count > 1:
@@ -388,23 +613,57 @@ def count_syllables(word: str) -> int:
     except Exception:
         return 1
 
-def rank_sentences_by_importance(sentences: List[str]) -> List[str]:
-    """Rank sentences by importance for study material generation"""
+def rank_sentences_by_importance(sentences: List[str], top_k: Optional[int] = None) -> List[str]:
+    """Rank sentences by importance for study material generation, keeping only the top_k when given"""
     if not sentences:
         return []
-        
-    scored_sentences = []
     
-    for sentence in sentences:
-        if sentence.strip():  # Skip empty sentences
-            score = calculate_sentence_importance(sentence)
-            scored_sentences.append((sentence.strip(), score))
+    scored_sentences = (
+        (sentence.strip(), calculate_sentence_importance(sentence))
+        for sentence in sentences
+        if sentence.strip()  # Skip empty sentences
+    )
     
-    # Sort by score (highest first)
-    scored_sentences.sort(key=lambda x: x[1], reverse=True)
+    # Highest score first; ties keep document order either way
+    if top_k is not None:
+        scored_sentences = heapq.nlargest(top_k, scored_sentences, key=lambda x: x[1])
+    else:
+        scored_sentences = sorted(scored_sentences, key=lambda x: x[1], reverse=True)
     
     return [sentence for sentence, score in scored_sentences]
 
+_DIGIT_RE = re.compile(r'\d')
+
+# Sentence importance indicators and the score each adds once when it occurs
+_KEYWORD_WEIGHTS = {
+    # Keyword indicators
+    **dict.fromkeys([
+        'important', 'significant', 'crucial', 'essential', 'key', 'main', 'primary',
+        'fundamental', 'critical', 'major', 'principal', 'central', 'vital'
+    ], 1.5),
+    # Definition indicators
+    **dict.fromkeys([' is ', ' are ', ' means ', ' refers to ', ' defined as ', ' known as '], 1.0),
+    # Causal relationships
+    **dict.fromkeys(['because', 'therefore', 'thus', 'consequently', 'as a result', 'due to'], 1.0),
+}
+
+# One scan per sentence finds every indicator, overlapping ones included: an Aho-Corasick
+# automaton when pyahocorasick is installed, else a lookahead alternation (no two
+# indicators start with the same characters, so each position matches at most one)
+if HAS_AHOCORASICK:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in _KEYWORD_WEIGHTS:
+        _KEYWORD_AUTOMATON.add_word(_keyword, _keyword)
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_RE = re.compile('(?=(%s))' % '|'.join(map(re.escape, _KEYWORD_WEIGHTS)))
+
+def _find_keywords(text: str) -> set:
+    """Distinct importance indicators occurring in text"""
+    if HAS_AHOCORASICK:
+        return {keyword for _, keyword in _KEYWORD_AUTOMATON.iter(text)}
+    return set(_KEYWORD_RE.findall(text))
+
 def calculate_sentence_importance(sentence: str) -> float:
     """Calculate importance score for a sentence"""
     if not sentence or not sentence.strip():
@@ -414,45 +673,20 @@ def calculate_sentence_importance(sentence: str) -> float:
     sentence = sentence.strip()
     
     # Length factor (prefer medium-length sentences)
-    if HAS_NLTK:
-        try:
-            word_count = len(word_tokenize(sentence))
-        except:
-            word_count = len(sentence.split())
-    else:
-        word_count = len(sentence.split())
-        
+    word_count = len(_fast_words(sentence))
+    
     if 10 <= word_count <= 25:
         score += 2.0
     elif 8 <= word_count <= 30:
         score += 1.0
     
-    # Keyword indicators
-    importance_keywords = [
-        'important', 'significant', 'crucial', 'essential', 'key', 'main', 'primary',
-        'fundamental', 'critical', 'major', 'principal', 'central', 'vital'
-    ]
-    
-    for keyword in importance_keywords:
-        if keyword in sentence.lower():
-            score += 1.5
-    
-    # Definition indicators
-    definition_indicators = [' is ', ' are ', ' means ', ' refers to ', ' defined as ', ' known as ']
-    for indicator in definition_indicators:
-        if indicator in sentence.lower():
-            score += 1.0
+    # Keyword, definition and causal indicators
+    score += sum(_KEYWORD_WEIGHTS[keyword] for keyword in _find_keywords(sentence.lower()))
     
     # Numerical information
-    if re.search(r'\d+', sentence):
+    if _DIGIT_RE.search(sentence):
         score += 0.5
     
-    # Causal relationships
-    causal_words = ['because', 'therefore', 'thus', 'consequently', 'as a result', 'due to']
-    for word in causal_words:
-        if word in sentence.lower():
-            score += 1.0
-    
     # Avoid very short or very long sentences
     if word_count < 5 or word_count > 40:
         score -= 1.0
@@ -462,33 +696,33 @@ def calculate_sentence_importance(sentence: str) -> float:
 # Security utilities
 def generate_api_key() -> str:
     """Generate secure API key"""
-    import secrets
     return secrets.token_urlsafe(32)
 
 def hash_password(password: str) -> str:
     """Hash password using secure method"""
-    from werkzeug.security import generate_password_hash
     return generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
 
 def verify_password(password: str, password_hash: str) -> bool:
     """Verify password against hash"""
-    from werkzeug.security import check_password_hash
     return check_password_hash(password_hash, password)
 
 def generate_reset_token() -> str:
     """Generate password reset token"""
-    import secrets
     return secrets.token_urlsafe(32)
 
+# ASCII-only patterns: re.ASCII keeps the engine off its Unicode class tables
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', re.ASCII)
+_NON_DIGIT_BYTES_RE = re.compile(rb'[^0-9]')
+_KE_PHONE_RE = re.compile(r'^\+254[17][0-9]{8}$', re.ASCII)
+
 def validate_email(email: str) -> bool:
     """Validate email address format"""
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}
-    return re.match(email_pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def validate_phone_number(phone: str, country_code: str = '+254') -> str:
     """Validate and format Kenyan phone number"""
     # Remove all non-digit characters
-    phone = re.sub(r'\D', '', phone)
+    phone = _NON_DIGIT_BYTES_RE.sub(b'', phone.encode('ascii', 'ignore')).decode('ascii')
     
     # Handle different formats
     if phone.startswith('254'):
@@ -501,7 +735,7 @@ def validate_phone_number(phone: str, country_code: str = '+254') -> str:
         raise ValueError("Invalid phone number format")
     
     # Validate Kenyan mobile number format
-    if not re.match(r'^\+254[17]\d{8}, phone):
+    if not _KE_PHONE_RE.match(phone):
         raise ValueError("Please enter a valid Kenyan mobile number")
     
     return phone
@@ -530,7 +764,7 @@ def validate_study_content(content: str) -> Dict[str, Any]:
         validation_result['warnings'].append("Content appears to be in a non-English language. AI generation works best with English content.")
     
     # Educational content quality
-    sentences = sent_tokenize(content)
+    sentences = _sent_tokenize(content)
     if len(sentences) < 5:
         validation_result['warnings'].append("Content has very few sentences. More detailed content will produce better study materials.")
     
@@ -540,47 +774,48 @@ def validate_study_content(content: str) -> Dict[str, Any]:
     
     return validation_result
 
+_COMMON_ENGLISH_WORDS = frozenset({
+    'the', 'and', 'is', 'in', 'to', 'of', 'a', 'that', 'it', 'with',
+    'for', 'as', 'was', 'on', 'are', 'by', 'this', 'be', 'at', 'from'
+})
+
+# Words read before is_primarily_english may accept the text on its running ratio
+_ENGLISH_PREFIX_WORDS = 200
+
 def is_primarily_english(text: str) -> bool:
     """Check if text is primarily in English"""
     try:
-        # Simple heuristic: check for common English words
-        common_english_words = {
-            'the', 'and', 'is', 'in', 'to', 'of', 'a', 'that', 'it', 'with',
-            'for', 'as', 'was', 'on', 'are', 'by', 'this', 'be', 'at', 'from'
-        }
+        # Simple heuristic: check for common English words, streaming words so that
+        # clearly English text is accepted without scanning all of it
+        english_word_count = 0
+        word_count = 0
+        for word_count, match in enumerate(_WORD_RE.finditer(text.lower()), 1):
+            if match.group() in _COMMON_ENGLISH_WORDS:
+                english_word_count += 1
+                if word_count >= _ENGLISH_PREFIX_WORDS and english_word_count > word_count * 0.1:
+                    return True
         
-        if HAS_NLTK:
-            try:
-                words = word_tokenize(text.lower())
-            except:
-                words = text.lower().split()
-        else:
-            words = text.lower().split()
-            
-        if not words:
+        if not word_count:
             return False
-            
-        english_word_count = sum(1 for word in words if word in common_english_words)
-        return english_word_count / len(words) > 0.1
+        
+        return english_word_count / word_count > 0.1
         
     except Exception:
         return True  # Assume English if detection fails
 
+# One alternation so the content is scanned once, stopping at the first hit
+_STRUCTURED_RE = re.compile(
+    r'^\d+\.'              # Numbered lists
+    r'|^-\s'               # Bullet points
+    r'|^#+ '               # Markdown headers
+    r'|[A-Z][^.]{20,}:'    # Section headers with colons
+    r'|\n\s*\n\s*[A-Z]',   # Paragraph breaks
+    re.MULTILINE
+)
+
 def has_structured_content(content: str) -> bool:
     """Check if content has structured formatting"""
-    indicators = [
-        r'^\d+\.',  # Numbered lists
-        r'^-\s',    # Bullet points
-        r'^#+ ',    # Markdown headers
-        r'[A-Z][^.]{20,}:',  # Section headers with colons
-        r'\n\s*\n\s*[A-Z]'   # Paragraph breaks
-    ]
-    
-    for pattern in indicators:
-        if re.search(pattern, content, re.MULTILINE):
-            return True
-    
-    return False
+    return _STRUCTURED_RE.search(content) is not None
 
 # Database utilities
 def create_database_backup(db_uri: str, backup_path: str) -> bool:
@@ -588,8 +823,6 @@ def create_database_backup(db_uri: str, backup_path: str) -> bool:
     try:
         # For MySQL databases
         if 'mysql' in db_uri:
-            import subprocess
-            
             # Extract database connection details
             # This is a simplified version - implement proper parsing
             result = subprocess.run([
@@ -614,22 +847,23 @@ def create_database_backup(db_uri: str, backup_path: str) -> bool:
 def cleanup_old_files(directory: str, max_age_days: int = 7) -> int:
     """Clean up old uploaded files"""
     try:
-        cutoff_date = datetime.now() - timedelta(days=max_age_days)
+        cutoff = time.time() - max_age_days * 86400
         deleted_count = 0
         
-        for filename in os.listdir(directory):
-            filepath = os.path.join(directory, filename)
-            
-            if os.path.isfile(filepath):
-                file_modified = datetime.fromtimestamp(os.path.getmtime(filepath))
-                
-                if file_modified < cutoff_date:
-                    try:
-                        os.remove(filepath)
-                        deleted_count += 1
-                        logger.info(f"Deleted old file: {filename}")
-                    except Exception as e:
-                        logger.error(f"Failed to delete {filename}: {e}")
+        # scandir entries carry their type, and stat() is cached per entry
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                        continue
+                    
+                    os.unlink(entry.path)
+                    deleted_count += 1
+                    logger.info(f"Deleted old file: {entry.name}")
+                except Exception as e:
+                    logger.error(f"Failed to delete {entry.name}: {e}")
         
         return deleted_count
         
@@ -640,9 +874,6 @@ def cleanup_old_files(directory: str, max_age_days: int = 7) -> int:
 # Performance utilities
 def measure_execution_time(func):
     """Decorator to measure function execution time"""
-    import functools
-    import time
-    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
@@ -658,6 +889,10 @@ def measure_execution_time(func):
 
 def log_api_usage(user_id: int, endpoint: str, success: bool, response_time: float):
     """Log API usage for analytics"""
+    # Skip building and serializing the payload when INFO is filtered out
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    
     try:
         usage_data = {
             'user_id': user_id,
@@ -668,85 +903,135 @@ def log_api_usage(user_id: int, endpoint: str, success: bool, response_time: flo
         }
         
         # In production, you might want to send this to a dedicated logging service
-        logger.info(f"API Usage: {json.dumps(usage_data)}")
+        logger.info("API Usage: %s", _log_dumps(usage_data))
         
     except Exception as e:
         logger.error(f"Usage logging failed: {e}")
 
 # Rate limiting utilities
 class RateLimiter:
-    """Simple in-memory rate limiter"""
+    """Simple in-memory rate limiter
+    
+    Each user's request times (time.monotonic()) sit oldest-first in a deque, so
+    expired ones are popped from the left instead of rebuilding a list per call.
+    """
     
     def __init__(self):
-        self.requests = {}
+        self.requests: Dict[int, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _prune(request_times: Deque[float], window_start: float) -> None:
+        """Drop request times at or before window_start"""
+        while request_times and request_times[0] <= window_start:
+            request_times.popleft()
     
     def is_allowed(self, user_id: int, limit: int, window_minutes: int = 60) -> bool:
         """Check if request is allowed within rate limit"""
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=window_minutes)
-        
-        # Clean old requests
-        if user_id in self.requests:
-            self.requests[user_id] = [
-                req_time for req_time in self.requests[user_id] 
-                if req_time > window_start
-            ]
-        else:
-            self.requests[user_id] = []
+        now = time.monotonic()
         
-        # Check if under limit
-        if len(self.requests[user_id]) < limit:
-            self.requests[user_id].append(now)
-            return True
+        with self._lock:
+            request_times = self.requests[user_id]
+            self._prune(request_times, now - window_minutes * 60)
+            
+            # Check if under limit
+            if len(request_times) < limit:
+                request_times.append(now)
+                return True
         
         return False
     
+    def allow_batch(self, user_id: int, n: int, limit: int, window_minutes: int = 60) -> int:
+        """Admit up to n requests in one call and return how many were allowed
+        
+        Takes the lock and prunes expired timestamps once for the whole batch
+        instead of once per request.
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            request_times = self.requests[user_id]
+            self._prune(request_times, now - window_minutes * 60)
+            allowed = max(0, min(n, limit - len(request_times)))
+            request_times.extend([now] * allowed)
+        
+        return allowed
+    
     def get_remaining_requests(self, user_id: int, limit: int, window_minutes: int = 60) -> int:
         """Get remaining requests in current window"""
-        now = datetime.utcnow()
-        window_start = now - timedelta(minutes=window_minutes)
-        
-        if user_id in self.requests:
-            recent_requests = [
-                req_time for req_time in self.requests[user_id] 
-                if req_time > window_start
-            ]
-            return max(0, limit - len(recent_requests))
+        now = time.monotonic()
         
-        return limit
+        with self._lock:
+            request_times = self.requests.get(user_id)
+            if not request_times:
+                return limit
+            
+            self._prune(request_times, now - window_minutes * 60)
+            return max(0, limit - len(request_times))
 
 # Caching utilities
 class SimpleCache:
-    """Simple in-memory cache for API responses"""
+    """Simple in-memory LRU cache for API responses
+    
+    Holds at most max_size entries, evicting the least recently used, and drops
+    expired entries every sweep_every sets instead of only when they are read again.
+    """
     
-    def __init__(self, default_ttl: int = 300):
-        self.cache = {}
+    def __init__(self, default_ttl: int = 300, max_size: int = 10_000, sweep_every: int = 1024):
+        self.cache = OrderedDict()  # key -> (value, time.monotonic() expiry)
         self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.sweep_every = sweep_every
+        self._sets = 0
+        self._lock = threading.Lock()
     
     def get(self, key: str) -> Any:
         """Get cached value"""
-        if key in self.cache:
-            value, expiry = self.cache[key]
-            if datetime.utcnow() < expiry:
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            
+            value, expiry = entry
+            if time.monotonic() < expiry:
+                self.cache.move_to_end(key)
                 return value
-            else:
-                del self.cache[key]
+            
+            del self.cache[key]
         return None
     
     def set(self, key: str, value: Any, ttl: int = None) -> None:
         """Set cached value"""
         ttl = ttl or self.default_ttl
-        expiry = datetime.utcnow() + timedelta(seconds=ttl)
-        self.cache[key] = (value, expiry)
+        expiry = time.monotonic() + ttl
+        
+        with self._lock:
+            self.cache[key] = (value, expiry)
+            self.cache.move_to_end(key)
+            
+            self._sets += 1
+            if self._sets % self.sweep_every == 0:
+                self._sweep_expired()
+            
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+    
+    def _sweep_expired(self) -> None:
+        """Drop every expired entry (caller holds the lock)"""
+        now = time.monotonic()
+        expired = [key for key, (_, expiry) in self.cache.items() if expiry <= now]
+        for key in expired:
+            del self.cache[key]
     
     def delete(self, key: str) -> None:
         """Delete cached value"""
-        if key in self.cache:
-            del self.cache[key]
+        with self._lock:
+            self.cache.pop(key, None)
     
     def clear(self) -> None:
         """Clear all cached values"""
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
 
 # Error handling utilities
 class BrainyPalException(Exception):
@@ -775,14 +1060,15 @@ def handle_api_error(error: Exception, user_id: int = None, endpoint: str = None
     }
     
     # Log error with context
-    log_context = {
-        'user_id': user_id,
-        'endpoint': endpoint,
-        'error_type': type(error).__name__,
-        'error_message': str(error)
-    }
-    
-    logger.error(f"API Error: {json.dumps(log_context)}")
+    if logger.isEnabledFor(logging.ERROR):
+        log_context = {
+            'user_id': user_id,
+            'endpoint': endpoint,
+            'error_type': type(error).__name__,
+            'error_message': str(error)
+        }
+        
+        logger.error("API Error: %s", _log_dumps(log_context))
     
     # Customize error message for users
     if isinstance(error, ContentProcessingError):
@@ -799,12 +1085,13 @@ def handle_api_error(error: Exception, user_id: int = None, endpoint: str = None
 # Environment utilities
 def load_environment_variables():
     """Load environment variables from .env file"""
+    if not HAS_DOTENV:
+        logger.warning("python-dotenv not installed. Environment variables should be set manually.")
+        return
+    
     try:
-        from dotenv import load_dotenv
         load_dotenv()
         logger.info("Environment variables loaded from .env file")
-    except ImportError:
-        logger.warning("python-dotenv not installed. Environment variables should be set manually.")
     except Exception as e:
         logger.error(f"Failed to load environment variables: {e}")
 
@@ -894,7 +1181,7 @@ cache = SimpleCache()
 
 # Export all utility functions and classes
 __all__ = [
-    'allowed_file', 'get_file_type', 'generate_secure_filename', 'get_file_size_mb',
+    'allowed_file', 'get_file_type', 'sniff_file_type', 'generate_secure_filename', 'get_file_size_mb',
     'process_uploaded_file', 'extract_text_from_pdf', 'extract_text_from_word', 
     'extract_text_from_text_file', 'clean_extracted_text', 'validate_file_content',
     'preprocess_study_content', 'extract_headers', 'estimate_content_difficulty',